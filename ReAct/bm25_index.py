@@ -0,0 +1,315 @@
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the to was
+were what when where which who whom why will with how does did do
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens with stopwords removed.
+    """
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def iter_corpus(path):
+    """
+    Yield documents from a corpus file.
+    JSONL lines need a "text" field (plus optional "title"/"id"); any other file
+    is read as plain text with one passage per non-empty line.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for line in f:
+                if line.strip():
+                    yield {"text": line.strip()}
+
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Segment:
+    """
+    One immutable, memory-mapped slice of the index.
+
+    Files in a segment directory:
+      meta.json          document count and total token count
+      docs.bin           UTF-8 JSON of each document, back to back
+      doc_offsets.bin    uint64[num_docs + 1] byte offsets into docs.bin
+      doc_lengths.bin    uint32[num_docs] token count per document
+      terms.bin          sorted UTF-8 terms, back to back
+      term_offsets.bin   uint64[num_terms + 1] byte offsets into terms.bin
+      post_offsets.bin   uint64[num_terms + 1] entry offsets into postings.bin
+      postings.bin       uint32 (doc, term frequency) pairs grouped by term
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.num_docs = meta["num_docs"]
+        self.total_length = meta["total_length"]
+
+        self._maps = {}
+        for name in ("docs", "doc_offsets", "doc_lengths", "terms", "term_offsets", "post_offsets", "postings"):
+            self._maps[name] = _map_file(os.path.join(path, name + ".bin"))
+
+        self.doc_offsets = memoryview(self._maps["doc_offsets"]).cast("Q")
+        self.doc_lengths = memoryview(self._maps["doc_lengths"]).cast("I")
+        self.term_offsets = memoryview(self._maps["term_offsets"]).cast("Q")
+        self.post_offsets = memoryview(self._maps["post_offsets"]).cast("Q")
+        self.postings = memoryview(self._maps["postings"]).cast("I")
+        self.num_terms = len(self.term_offsets) - 1
+
+    @staticmethod
+    def write(path, docs):
+        """
+        Build a segment directory from a list of documents.
+        """
+        os.makedirs(path)
+        postings = defaultdict(list)
+        doc_offsets = array("Q", [0])
+        doc_lengths = array("I")
+
+        with open(os.path.join(path, "docs.bin"), "wb") as f:
+            for local_id, doc in enumerate(docs):
+                tokens = tokenize(f"{doc.get('title', '')} {doc['text']}")
+                for term, tf in Counter(tokens).items():
+                    postings[term].append((local_id, tf))
+                doc_lengths.append(len(tokens))
+                f.write(json.dumps(doc, ensure_ascii=False).encode("utf-8"))
+                doc_offsets.append(f.tell())
+
+        terms = sorted(term.encode("utf-8") for term in postings)
+        term_offsets = array("Q", [0])
+        post_offsets = array("Q", [0])
+        flat = array("I")
+        with open(os.path.join(path, "terms.bin"), "wb") as f:
+            for term in terms:
+                f.write(term)
+                term_offsets.append(f.tell())
+                for local_id, tf in postings[term.decode("utf-8")]:
+                    flat.append(local_id)
+                    flat.append(tf)
+                post_offsets.append(len(flat) // 2)
+
+        for name, data in (("doc_offsets", doc_offsets), ("doc_lengths", doc_lengths),
+                           ("term_offsets", term_offsets), ("post_offsets", post_offsets),
+                           ("postings", flat)):
+            with open(os.path.join(path, name + ".bin"), "wb") as f:
+                data.tofile(f)
+
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"num_docs": len(doc_lengths), "total_length": sum(doc_lengths)}, f)
+
+    def _term(self, i):
+        return self._maps["terms"][self.term_offsets[i]:self.term_offsets[i + 1]]
+
+    def lookup(self, term):
+        """
+        Return (start, end) entry offsets of a term's postings, or None.
+        """
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms and self._term(lo) == key:
+            return self.post_offsets[lo], self.post_offsets[lo + 1]
+        return None
+
+    def document(self, local_id):
+        raw = self._maps["docs"][self.doc_offsets[local_id]:self.doc_offsets[local_id + 1]]
+        return json.loads(bytes(raw).decode("utf-8"))
+
+    def close(self):
+        for view in (self.doc_offsets, self.doc_lengths, self.term_offsets, self.post_offsets, self.postings):
+            view.release()
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+class BM25Index:
+    """
+    Persistent inverted index with BM25 ranking.
+    Each add_documents() call writes new immutable segments, so adds are
+    incremental and opening an index only memory-maps existing files.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._segments = []
+        self._bases = []
+        os.makedirs(path, exist_ok=True)
+
+        manifest = os.path.join(path, "manifest.json")
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                names = json.load(f)["segments"]
+            for name in names:
+                self._attach(_Segment(os.path.join(path, name)))
+
+    def _attach(self, segment):
+        self._bases.append(len(self))
+        self._segments.append(segment)
+
+    def _write_manifest(self):
+        manifest = os.path.join(self.path, "manifest.json")
+        names = [os.path.basename(segment.path) for segment in self._segments]
+        with open(manifest + ".tmp", "w") as f:
+            json.dump({"segments": names}, f)
+        os.replace(manifest + ".tmp", manifest)
+
+    def __len__(self):
+        return sum(segment.num_docs for segment in self._segments)
+
+    def add_documents(self, docs, batch_size=100000):
+        """
+        Index documents ({"text": ..., "title": ..., "id": ...}); returns how many were added.
+        Documents are written in segments of at most batch_size to bound memory use.
+        """
+        added = 0
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                added += self._add_segment(batch)
+                batch = []
+        if batch:
+            added += self._add_segment(batch)
+        return added
+
+    def add_corpus(self, corpus_path, batch_size=100000):
+        return self.add_documents(iter_corpus(corpus_path), batch_size)
+
+    def _add_segment(self, docs):
+        with self._lock:
+            number = 0
+            while os.path.exists(os.path.join(self.path, f"seg_{number:06d}")):
+                number += 1
+            segment_path = os.path.join(self.path, f"seg_{number:06d}")
+            _Segment.write(segment_path, docs)
+            self._attach(_Segment(segment_path))
+            self._write_manifest()
+        return len(docs)
+
+    def search(self, query, k=5):
+        """
+        Return the top-k (score, document) pairs for a query, best first.
+        """
+        terms = set(tokenize(query))
+        segments = list(zip(self._segments, self._bases))
+        num_docs = sum(segment.num_docs for segment, _ in segments)
+        if not terms or not num_docs:
+            return []
+        avg_length = sum(segment.total_length for segment, _ in segments) / num_docs
+
+        scores = defaultdict(float)
+        for term in terms:
+            ranges = [(segment, base, segment.lookup(term)) for segment, base in segments]
+            ranges = [(segment, base, span) for segment, base, span in ranges if span is not None]
+            df = sum(end - start for _, _, (start, end) in ranges)
+            if not df:
+                continue
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+            for segment, base, (start, end) in ranges:
+                postings = segment.postings
+                lengths = segment.doc_lengths
+                for i in range(start, end):
+                    local_id = postings[2 * i]
+                    tf = postings[2 * i + 1]
+                    norm = self.k1 * (1 - self.b + self.b * lengths[local_id] / avg_length)
+                    scores[base + local_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.get_document(doc_id)) for doc_id, score in best]
+
+    def get_document(self, doc_id):
+        index = bisect_left(self._bases, doc_id + 1) - 1
+        return self._segments[index].document(doc_id - self._bases[index])
+
+    def optimize(self):
+        """
+        Merge all segments into one to speed up queries after many small adds.
+        """
+        if len(self._segments) <= 1:
+            return
+        old = self._segments
+        docs = [segment.document(i) for segment in old for i in range(segment.num_docs)]
+        with self._lock:
+            self._segments, self._bases = [], []
+        self._add_segment(docs)
+        with self._lock:
+            for segment in old:
+                segment.close()
+                for name in os.listdir(segment.path):
+                    os.remove(os.path.join(segment.path, name))
+                os.rmdir(segment.path)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments, self._bases = [], []
+
+
+def main():
+    """
+    Build or query an index from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Local BM25 search index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add = subparsers.add_parser("add", help="index a JSONL or plain-text corpus")
+    add.add_argument("index")
+    add.add_argument("corpus")
+    add.add_argument("--batch-size", type=int, default=100000)
+    query = subparsers.add_parser("query", help="search the index")
+    query.add_argument("index")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    subparsers.add_parser("optimize", help="merge segments").add_argument("index")
+    args = parser.parse_args()
+
+    index = BM25Index(args.index)
+    if args.command == "add":
+        print(f"Indexed {index.add_corpus(args.corpus, args.batch_size)} documents ({len(index)} total)")
+    elif args.command == "query":
+        for score, doc in index.search(args.text, args.k):
+            print(f"{score:.3f}\t{doc.get('title', '')}\t{doc['text'][:120]}")
+    else:
+        index.optimize()
+        print(f"Merged into one segment of {len(index)} documents")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import hashlib
+import re
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is optional; ~4 characters per token is close enough for budgeting
+    _ENCODING = None
+
+def count_tokens(text):
+    """
+    Count the tokens in a piece of text.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text, max_tokens):
+    """
+    Cut text down to at most max_tokens tokens, marking the cut.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    marker = " ...[truncated]"
+    keep = max(max_tokens - count_tokens(marker), 0)
+    if _ENCODING is not None:
+        head = _ENCODING.decode(_ENCODING.encode(text)[:keep])
+    else:
+        head = text[:keep * 4]
+    return head.rstrip() + marker
+
+def _first_sentence(text, max_tokens=40):
+    match = re.match(r"(.+?[.!?])(\s|$)", text.strip(), re.DOTALL)
+    sentence = match.group(1) if match else text.strip()
+    return truncate_tokens(" ".join(sentence.split()), max_tokens)
+
+class Step:
+    """
+    One entry of the think/act/observe trace.
+    text is the raw content; compact is what goes into prompts.
+    """
+
+    def __init__(self, kind, text, iteration, compact=None):
+        self.kind = kind
+        self.text = text
+        self.iteration = iteration
+        self.compact = text if compact is None else compact
+        self.tokens = count_tokens(text)
+        self.compact_tokens = count_tokens(self.compact)
+
+    def render(self):
+        return f"{self.kind.capitalize()}: {self.compact}"
+
+    def to_dict(self):
+        return {"kind": self.kind, "text": self.text, "iteration": self.iteration, "tokens": self.tokens}
+
+class ContextManager:
+    """
+    Keeps the full ReAct trace and fits it into a prompt token budget.
+    Observations are deduplicated line by line against earlier ones and truncated;
+    steps older than the last keep_recent iterations are folded incrementally into
+    a running summary, so prompt size stays bounded however many iterations run.
+    """
+
+    def __init__(self, max_prompt_tokens=1500, max_observation_tokens=400,
+                 max_summary_tokens=300, keep_recent=2, summarizer=None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_observation_tokens = max_observation_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.keep_recent = keep_recent
+        # summarizer(previous_summary, new_steps_text) -> summary; extractive if None
+        self.summarizer = summarizer
+        self.reset()
+
+    def reset(self):
+        self.trace = []
+        self.summary = ""
+        self._summarized = 0
+        self._seen_lines = set()
+        self._seen_observations = {}
+
+    def add(self, kind, text, iteration):
+        """
+        Record a step ("thought", "action" or "observation") and return it.
+        """
+        if kind == "observation":
+            compact = self._compact_observation(text, iteration)
+        else:
+            compact = truncate_tokens(text, self.max_observation_tokens)
+        step = Step(kind, text, iteration, compact)
+        self.trace.append(step)
+        return step
+
+    def _compact_observation(self, text, iteration):
+        digest = hashlib.sha1(" ".join(text.split()).lower().encode("utf-8")).hexdigest()
+        if digest in self._seen_observations:
+            return f"(same as the observation from iteration {self._seen_observations[digest] + 1})"
+        self._seen_observations[digest] = iteration
+
+        lines = []
+        for line in text.splitlines():
+            key = " ".join(line.split()).lower()
+            if key and key in self._seen_lines:
+                continue
+            self._seen_lines.add(key)
+            lines.append(line)
+        compact = "\n".join(lines).strip() or "(nothing new)"
+        return truncate_tokens(compact, self.max_observation_tokens)
+
+    def _fold(self, steps):
+        """
+        Merge steps into the running summary.
+        """
+        if not steps:
+            return
+        if self.summarizer is not None:
+            new_text = "\n".join(step.render() for step in steps)
+            self.summary = self.summarizer(self.summary, new_text).strip()
+        else:
+            notes = [f"- {step.kind}: {_first_sentence(step.compact)}" for step in steps
+                     if step.kind != "action"]
+            self.summary = "\n".join(filter(None, [self.summary] + notes))
+        if count_tokens(self.summary) > self.max_summary_tokens:
+            # Keep the newest notes when the summary itself outgrows its budget
+            lines = self.summary.splitlines()
+            while len(lines) > 1 and count_tokens("\n".join(lines)) > self.max_summary_tokens:
+                lines.pop(0)
+            self.summary = truncate_tokens("\n".join(lines), self.max_summary_tokens)
+
+    def build_prompt(self, question):
+        """
+        Render the question, summary and recent steps within max_prompt_tokens.
+        """
+        if self.trace:
+            latest = self.trace[-1].iteration
+            cutoff = next((i for i, step in enumerate(self.trace)
+                           if step.iteration > latest - self.keep_recent), len(self.trace))
+            if cutoff > self._summarized:
+                self._fold(self.trace[self._summarized:cutoff])
+                self._summarized = cutoff
+
+        while True:
+            prompt = self._render(question, self.trace[self._summarized:])
+            recent = len(self.trace) - self._summarized
+            if count_tokens(prompt) <= self.max_prompt_tokens or recent <= 1:
+                break
+            # Still over budget: summarize the oldest recent step as well
+            self._fold(self.trace[self._summarized:self._summarized + 1])
+            self._summarized += 1
+
+        if count_tokens(prompt) > self.max_prompt_tokens:
+            prompt = truncate_tokens(prompt, self.max_prompt_tokens)
+        return prompt
+
+    def _render(self, question, recent):
+        parts = [f"Original question: {question}"]
+        if self.summary:
+            parts.append(f"Summary of earlier steps:\n{self.summary}")
+        if recent:
+            parts.append("Recent steps:\n" + "\n".join(step.render() for step in recent))
+        return "\n\n".join(parts)
+
+    def stats(self):
+        return {
+            "steps": len(self.trace),
+            "trace_tokens": sum(step.tokens for step in self.trace),
+            "summarized_steps": self._summarized,
+            "summary_tokens": count_tokens(self.summary),
+        }
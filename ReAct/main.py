@@ -1,14 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+from context_manager import ContextManager
 from openai_server import OpenAIClient
 from search import search_web
+from shared.answer_cache import get_answer_cache
+from shared.errors import LLMError
+from shared.steps import emit_step, step_sink
+from shared.tracing import span
+
+ACTION_PREFIXES = ("SEARCH:", "ANSWER:")
+
+# One pool for every agent's early and parallel searches, so agents own no threads
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
+def _get_search_executor():
+    """
+    Return the shared thread pool that runs searches dispatched by agents.
+    """
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="react-search")
+        return _search_executor
+
+# Returned when no answer was reached within max_iterations; never cached
+NO_ANSWER = "I've gathered some information but may need more specific details to provide a complete answer."
+
+def parse_search_queries(thought, limit=1):
+    """
+    Distinct queries from the "SEARCH:" lines of a thought, in order, at most limit.
+    """
+    queries = []
+    seen = set()
+    for line in thought.strip().split("\n"):
+        line = line.strip()
+        if not line.startswith("SEARCH:"):
+            continue
+        query = line[len("SEARCH:"):].strip()
+        key = " ".join(query.lower().split())
+        if query and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    if len(queries) > limit:
+        emit_step("status", f"Dropping {len(queries) - limit} search queries over the limit of {limit}")
+    return queries[:limit]
+
+def merge_search_results(queries, results):
+    """
+    Merge the results of several queries into one observation, dropping lines an
+    earlier result already contained and folding misses into one line.
+    """
+    if len(queries) == 1:
+        return results[0]
+    sections = []
+    misses = []
+    seen = set()
+    for query, result in zip(queries, results):
+        if result.startswith("Unable to find information for:"):
+            misses.append(query)
+            continue
+        lines = []
+        for line in result.split("\n"):
+            key = " ".join(line.lower().split())
+            if key and key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        if any(line.strip() for line in lines):
+            sections.append(f"Results for '{query}':\n" + "\n".join(lines).strip())
+    if misses:
+        sections.append("No information found for: " + "; ".join(misses))
+    return "\n\n".join(sections)
 
 class ReActAgent:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, max_prompt_tokens=1500, summarize_with_llm=False, max_parallel_searches=1,
+                 use_answer_cache=False, on_step=None):
         self.openai_client = OpenAIClient(api_key)
-        self.conversation_history = []
+        self.context = ContextManager(
+            max_prompt_tokens=max_prompt_tokens,
+            summarizer=self.summarize_steps if summarize_with_llm else None
+        )
+        # Queries one thought may issue at once; above 1 the prompt offers several SEARCH lines
+        self.max_parallel_searches = max_parallel_searches
+        # Serve near-duplicate questions from the shared answer cache (shared/answer_cache.py)
+        self.use_answer_cache = use_answer_cache
+        # The answer cache match ({"question", "score"}) the last run was served from, if any
+        self.cache_hit = None
+        # Receives each step as an event dict (shared/steps.py); None prints them
+        self.on_step = on_step
+    
+    @property
+    def conversation_history(self):
+        """
+        Full think/act/observe trace of the current run, with per-step token counts.
+        """
+        return self.context.trace
     
-    def think(self, user_question):
+    def summarize_steps(self, previous_summary, new_steps):
+        """
+        Fold new trace steps into the running summary of earlier steps.
+        """
+        system_prompt = """You maintain a concise running summary of a research agent's progress.
+        Merge the new steps into the existing summary. Keep every fact, name, number and date
+        that could help answer the question; drop repetition and filler. Reply with the summary only."""
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew steps:\n{new_steps}"}
+        ]
+        
+        return self.openai_client.chat(messages, temperature=0.0, max_tokens=self.context.max_summary_tokens)
+    
+    def think(self, user_question, stream=False):
         """
         Reasoning step: Analyze the question and determine next action.
+        With stream=True, returns a generator of response text chunks.
         """
         system_prompt = """You are a ReAct agent that can reason and act. 
         You can either:
@@ -19,20 +127,40 @@ class ReActAgent:
         - "ANSWER: [your response]" if you can answer directly
         - "SEARCH: [search query]" if you need to search for information
         """
+        if self.max_parallel_searches > 1:
+            system_prompt += f"""
+        To look up several things at once (e.g. facts about different entities), write up to
+        {self.max_parallel_searches} "SEARCH: [search query]" lines, one query per line; they run in parallel.
+        """
         
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_question}
         ]
         
-        response = self.openai_client.send_message(messages)
+        response = self.openai_client.send_message(messages, stream=stream)
         return response
     
+    def search_many(self, queries, pending=None):
+        """
+        Run queries concurrently through search_web and merge the results into one
+        observation. pending maps queries to searches already submitted.
+        """
+        pending = dict(pending or {})
+        for query in queries:
+            if query not in pending:
+                pending[query] = _get_search_executor().submit(contextvars.copy_context().run, search_web, query)
+        return merge_search_results(queries, [pending[query].result() for query in queries])
+    
     def act(self, thought):
         """
         Acting step: Execute the determined action.
         """
         if thought.startswith("SEARCH:"):
+            if self.max_parallel_searches > 1:
+                queries = parse_search_queries(thought, self.max_parallel_searches)
+                if len(queries) > 1:
+                    return "search", self.search_many(queries)
             search_query = thought.replace("SEARCH:", "").strip()
             search_results = search_web(search_query)
             return "search", search_results
@@ -42,6 +170,61 @@ class ReActAgent:
         else:
             return "search", search_web(thought)
     
+    def think_and_act(self, user_question, on_token=None):
+        """
+        Streaming think + act: parses the action while the thought is still arriving.
+        A search starts as soon as each "SEARCH:" query line is complete (up to
+        max_parallel_searches of them), overlapping the rest of the completion;
+        "ANSWER:" text is passed to on_token as it streams.
+        Returns (thought, action_type, result) like think() followed by act().
+        """
+        thought = ""
+        action = None
+        pending_searches = {}
+        answer_sent = 0
+        
+        for token in self.think(user_question, stream=True):
+            thought += token
+            text = thought.lstrip()
+            
+            if action is None:
+                for prefix in ACTION_PREFIXES:
+                    if text.startswith(prefix):
+                        action = prefix
+                if action is None and not any(prefix.startswith(text[:len(prefix)]) for prefix in ACTION_PREFIXES):
+                    action = "other"
+            
+            if action == "SEARCH:" and len(pending_searches) < self.max_parallel_searches and "\n" in text:
+                # Every line but the last is complete
+                complete = text.rsplit("\n", 1)[0]
+                if self.max_parallel_searches == 1:
+                    queries = [complete[len("SEARCH:"):].split("\n", 1)[0].strip()]
+                else:
+                    queries = parse_search_queries(complete, self.max_parallel_searches)
+                for search_query in queries:
+                    if search_query and search_query not in pending_searches:
+                        pending_searches[search_query] = _get_search_executor().submit(
+                            contextvars.copy_context().run, search_web, search_query)
+            elif action == "ANSWER:" and on_token is not None:
+                answer = text[len("ANSWER:"):].lstrip()
+                if len(answer) > answer_sent:
+                    on_token(answer[answer_sent:])
+                    answer_sent = len(answer)
+        
+        text = thought.lstrip()
+        if action == "SEARCH:":
+            if self.max_parallel_searches > 1:
+                queries = parse_search_queries(text, self.max_parallel_searches)
+                if len(queries) > 1:
+                    return thought, "search", self.search_many(queries, pending_searches)
+            if not pending_searches:
+                search_query = text[len("SEARCH:"):].strip().split("\n", 1)[0].strip()
+                return thought, "search", search_web(search_query)
+            return thought, "search", next(iter(pending_searches.values())).result()
+        if action == "ANSWER:":
+            return thought, "answer", text[len("ANSWER:"):].strip()
+        return thought, "search", search_web(thought)
+    
     def observe(self, action_type, result):
         """
         Observation step: Process the results of the action.
@@ -51,40 +234,102 @@ class ReActAgent:
         else:
             return result
     
-    def run(self, user_question, max_iterations=3):
+    def run(self, user_question, max_iterations=3, stream=False, on_token=None):
         """
         Main ReAct loop: Think -> Act -> Observe -> Repeat
+        With stream=True, actions are dispatched while the thought streams in and the
+        final answer is passed token by token to on_token (printed by default).
+        Each run is traced as a "react.run" span with one child span per phase.
+        With use_answer_cache, a near-duplicate of an answered question returns the
+        stored answer at once and cache_hit records the match and its score.
+        Steps are reported as "status", "thought", "action", "observation", "token"
+        and "answer" events to on_step (or the current step sink).
         """
-        print(f"User Question: {user_question}")
-        print("-" * 50)
+        with span("react.run", stream=stream) as phase, step_sink(self.on_step):
+            self.cache_hit = None
+            if self.use_answer_cache:
+                hit = get_answer_cache().get("react", user_question)
+                if hit is not None:
+                    self.cache_hit = {"question": hit["question"], "score": hit["score"]}
+                    phase.set(cache_score=hit["score"])
+                    emit_step("status", f"User Question: {user_question}")
+                    emit_step("status", f"Cached answer for '{hit['question']}' (similarity {hit['score']:.2f})",
+                              cached_question=hit["question"], score=hit["score"])
+                    if stream and on_token is not None:
+                        on_token(hit["answer"])
+                    emit_step("answer", f"\nFinal Answer: {hit['answer']}", answer=hit["answer"])
+                    return hit["answer"]
+            
+            answer = self._run(user_question, max_iterations, stream, on_token)
+            if self.use_answer_cache and answer != NO_ANSWER:
+                get_answer_cache().put("react", user_question, answer)
+            return answer
+    
+    def _run(self, user_question, max_iterations, stream, on_token):
+        emit_step("status", f"User Question: {user_question}")
+        emit_step("status", "-" * 50)
         
         current_context = user_question
+        self.context.reset()
         
         for iteration in range(max_iterations):
-            print(f"\nIteration {iteration + 1}:")
-            print("Thinking...")
-            
-            # Think
-            thought = self.think(current_context)
-            print(f"Thought: {thought}")
+            emit_step("status", f"\nIteration {iteration + 1}:", iteration=iteration)
+            emit_step("status", "Thinking...", iteration=iteration)
             
-            # Act
-            action_type, result = self.act(thought)
-            print(f"Action: {action_type}")
+            if stream:
+                # Think and act, overlapping the search with the rest of the completion
+                streamed = []
+                def emit(token):
+                    if not streamed and on_token is None:
+                        emit_step("token", "\nFinal Answer: ")
+                    streamed.append(token)
+                    if on_token is not None:
+                        on_token(token)
+                    else:
+                        emit_step("token", token)
+                
+                with span("react.think_act", iteration=iteration) as phase:
+                    thought, action_type, result = self.think_and_act(current_context, on_token=emit)
+                    phase.set(action=action_type)
+                if streamed:
+                    if on_token is None:
+                        emit_step("token", "\n")
+                    emit_step("answer", f"Final Answer: {result}", answer=result, streamed=True)
+                    self.context.add("thought", thought, iteration)
+                    self.context.add("action", action_type, iteration)
+                    return result
+                emit_step("thought", f"Thought: {thought}", thought=thought, iteration=iteration)
+            else:
+                # Think
+                with span("react.think", iteration=iteration):
+                    thought = self.think(current_context)
+                emit_step("thought", f"Thought: {thought}", thought=thought, iteration=iteration)
+                
+                # Act
+                with span("react.act", iteration=iteration) as phase:
+                    action_type, result = self.act(thought)
+                    phase.set(action=action_type)
+            emit_step("action", f"Action: {action_type}", action=action_type, iteration=iteration)
+            self.context.add("thought", thought, iteration)
+            self.context.add("action", action_type, iteration)
             
             # Observe
-            observation = self.observe(action_type, result)
-            print(f"Observation: {observation[:200]}...")
+            with span("react.observe", iteration=iteration):
+                observation = self.observe(action_type, result)
+            emit_step("observation", f"Observation: {observation[:200]}...", action=action_type,
+                      observation=observation, iteration=iteration)
+            self.context.add("observation", observation, iteration)
             
             if action_type == "answer":
-                print(f"\nFinal Answer: {result}")
+                emit_step("answer", f"\nFinal Answer: {result}", answer=result)
                 return result
             
-            # Update context for next iteration
-            current_context = f"Original question: {user_question}\nPrevious search results: {observation}"
+            # Update context for next iteration, fitted to the prompt budget
+            with span("react.context", iteration=iteration):
+                current_context = self.context.build_prompt(user_question)
         
-        print("\nMax iterations reached. Providing best available answer.")
-        return "I've gathered some information but may need more specific details to provide a complete answer."
+        emit_step("status", "\nMax iterations reached. Providing best available answer.")
+        return NO_ANSWER
 
 def main():
     """
@@ -98,7 +343,10 @@ def main():
             break
         
         if user_input.strip():
-            agent.run(user_input)
+            try:
+                agent.run(user_input, stream=True)
+            except LLMError as e:
+                print(f"\nError calling OpenAI API: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
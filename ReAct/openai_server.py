@@ -1,34 +1,18 @@
-import openai
-import json
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.openai_client import OpenAIClient as BaseOpenAIClient
+
 # Load environment variables from .env file
 load_dotenv()
 
-class OpenAIClient:
-    def __init__(self, api_key=None):
-        if api_key:
-            openai.api_key = api_key
-        else:
-            # Try to get from environment variable
-            openai.api_key = os.getenv('OPENAI_API_KEY')
-            print(f"OpenAI API key: {openai.api_key}")
-    
-    def send_message(self, messages, model="gpt-3.5-turbo"):
-        """
-        Send messages to OpenAI API and get response.
-        Returns the assistant's response.
-        """
-        try:
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=messages,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error calling OpenAI API: {str(e)}"
+class OpenAIClient(BaseOpenAIClient):
+    """
+    Shared OpenAI client (cache, rate limiting, retries, typed errors)
+    plus the ReAct-specific helpers.
+    """
     
     def should_search(self, message):
         """
@@ -40,4 +24,4 @@ class OpenAIClient:
             "where is", "how to", "current", "latest", "recent", "news"
         ]
         message_lower = message.lower()
-        return any(keyword in message_lower for keyword in search_keywords)
\ No newline at end of file
+        return any(keyword in message_lower for keyword in search_keywords)
@@ -1,32 +1,122 @@
 import requests
 import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from bm25_index import BM25Index
+from search_cache import get_search_cache
 
-def search_web(query):
+# Keep-alive connections shared by every backend call
+_session = None
+_executor = None
+_local_index = None
+_pool_lock = threading.RLock()
+
+def _get_session():
+    """Return the shared pooled HTTP session, creating it on first use."""
+    global _session
+    with _pool_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def _get_executor():
+    """Return the shared thread pool used to query backends concurrently."""
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+        return _executor
+
+def search_web(query, use_cache=True, parallel=True):
     """
     Search the web for information using multiple approaches.
     Returns search results as a string.
+    Results, including misses, are cached per normalized query unless use_cache is False.
+    With parallel=True all backends are queried at once and the highest-priority
+    good result wins, so a slow backend no longer delays the ones after it.
     """
-    # Try multiple search methods for better results
-    methods = [
-        _search_duckduckgo,
-        _search_wikipedia,
-        _search_fallback
-    ]
+    cache = get_search_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(query)
+        if cached is not None:
+            backend, result = cached
+            return result if result is not None else f"Unable to find information for: {query}"
+    
+    if parallel:
+        backend, result, errored = _search_backends_parallel(query)
+    else:
+        backend, result, errored = _search_backends(query)
+    
+    # A miss is only worth remembering if every backend actually answered
+    if cache is not None and (result is not None or not errored):
+        cache.put(query, backend, result)
     
-    for method in methods:
+    if result is None:
+        return f"Unable to find information for: {query}"
+    return result
+
+def _search_backends(query):
+    """
+    Try each backend in priority order.
+    Returns (backend name, result or None, whether any backend raised).
+    """
+    errored = False
+    for name, method in _backends():
         try:
             result = method(query)
-            if result and "No specific information found" not in result and "Search failed" not in result:
-                return result
+            if _is_good_result(result):
+                return name, result, errored
         except Exception as e:
+            errored = True
             continue
     
-    return f"Unable to find information for: {query}"
+    return "none", None, errored
+
+def _search_backends_parallel(query):
+    """
+    Query every backend concurrently and keep the priority order when picking.
+    Returns as soon as the best available result is known; lower-priority calls
+    still queued are cancelled and ones already in flight are left to finish unseen.
+    """
+    executor = _get_executor()
+    futures = [(name, executor.submit(method, query)) for name, method in _backends()]
+    
+    errored = False
+    try:
+        for name, future in futures:
+            try:
+                result = future.result()
+                if _is_good_result(result):
+                    return name, result, errored
+            except Exception as e:
+                errored = True
+                continue
+    finally:
+        for _, future in futures:
+            future.cancel()
+    
+    return "none", None, errored
+
+def _backends():
+    # Try multiple search methods for better results, in priority order
+    return [
+        ("duckduckgo", _search_duckduckgo),
+        ("wikipedia", _search_wikipedia),
+        ("local", _search_local)
+    ]
+
+def _is_good_result(result):
+    return bool(result) and "No specific information found" not in result and "Search failed" not in result
 
 def _search_duckduckgo(query):
     """Search using DuckDuckGo API"""
-    url = "https://api.duckduckgo.com/"
+    url = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
     params = {
         'q': query,
         'format': 'json',
@@ -34,7 +124,7 @@ def _search_duckduckgo(query):
         'skip_disambig': '1'
     }
     
-    response = requests.get(url, params=params, timeout=5)
+    response = _get_session().get(url, params=params, timeout=5)
     data = response.json()
     
     result = ""
@@ -52,8 +142,8 @@ def _search_duckduckgo(query):
 
 def _search_wikipedia(query):
     """Search using Wikipedia API"""
-    url = "https://en.wikipedia.org/api/rest_v1/page/summary/" + query.replace(" ", "_")
-    response = requests.get(url, timeout=5)
+    url = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/api/rest_v1/page/summary/") + query.replace(" ", "_")
+    response = _get_session().get(url, timeout=5)
     
     if response.status_code == 200:
         data = response.json()
@@ -62,38 +152,29 @@ def _search_wikipedia(query):
     
     return None
 
-def _search_fallback(query):
-    """Fallback search with basic information"""
-    # Simple knowledge base for common queries
-    knowledge_base = {
-        "ceo of openai": "Sam Altman is the CEO of OpenAI. He co-founded OpenAI and has been instrumental in its development.",
-        "openai ceo": "Sam Altman is the CEO of OpenAI. He co-founded OpenAI and has been instrumental in its development.",
-        "sam altman": "Sam Altman is an American entrepreneur and investor, best known as the CEO of OpenAI.",
-        "capital of france": "Paris is the capital and largest city of France.",
-        "capital of china": "Beijing is the capital of China.",
-        "capital of japan": "Tokyo is the capital of Japan.",
-        "capital of germany": "Berlin is the capital of Germany.",
-        "capital of italy": "Rome is the capital of Italy.",
-        "capital of spain": "Madrid is the capital of Spain.",
-        "capital of uk": "London is the capital of the United Kingdom.",
-        "capital of usa": "Washington D.C. is the capital of the United States.",
-        "capital of canada": "Ottawa is the capital of Canada.",
-        "capital of australia": "Canberra is the capital of Australia.",
-        "capital of brazil": "Brasília is the capital of Brazil.",
-        "capital of india": "New Delhi is the capital of India.",
-        "capital of russia": "Moscow is the capital of Russia.",
-        "python programming": "Python is a high-level, general-purpose programming language known for its simplicity and readability.",
-        "what is python": "Python is a high-level, general-purpose programming language known for its simplicity and readability.",
-        "javascript": "JavaScript is a programming language commonly used for web development.",
-        "java": "Java is a high-level, class-based, object-oriented programming language.",
-        "c++": "C++ is a general-purpose programming language developed as an extension of the C programming language.",
-        "html": "HTML (HyperText Markup Language) is the standard markup language for creating web pages.",
-        "css": "CSS (Cascading Style Sheets) is a style sheet language used for describing the presentation of web pages.",
-        "sql": "SQL (Structured Query Language) is a domain-specific language used in programming and designed for managing data in relational databases."
-    }
-    
-    query_lower = query.lower().strip()
-    if query_lower in knowledge_base:
-        return knowledge_base[query_lower]
+def get_local_index():
+    """
+    Return the local BM25 index, opening it on first use.
+    SEARCH_INDEX_PATH points at the index directory; a new index is seeded
+    from knowledge_base.jsonl next to this file.
+    """
+    global _local_index
+    with _pool_lock:
+        if _local_index is None:
+            here = os.path.dirname(os.path.abspath(__file__))
+            path = os.getenv("SEARCH_INDEX_PATH", os.path.join(here, ".search_index"))
+            index = BM25Index(path)
+            seed = os.path.join(here, "knowledge_base.jsonl")
+            if not len(index) and os.path.exists(seed):
+                index.add_corpus(seed)
+            _local_index = index
+        return _local_index
+
+def _search_local(query, k=3):
+    """Search the local BM25 index for in-domain passages"""
+    min_score = float(os.getenv("SEARCH_INDEX_MIN_SCORE", "1.0"))
+    hits = [doc for score, doc in get_local_index().search(query, k) if score >= min_score]
     
-    return None
\ No newline at end of file
+    if not hits:
+        return None
+    return "\n".join(doc["text"] for doc in hits)
@@ -0,0 +1,189 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a result stays fresh, per backend that produced it. "none" is the
+# negative-cache entry stored when every backend came back empty.
+DEFAULT_TTLS = {
+    "duckduckgo": 24 * 3600,
+    "wikipedia": 7 * 24 * 3600,
+    "local": 24 * 3600,
+    "none": 10 * 60,
+}
+
+# SQLite rows are pruned on open and after this many puts
+PRUNE_EVERY = 256
+
+
+def normalize_query(query):
+    """
+    Normalize a query so trivially different spellings share a cache entry.
+    """
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.strip(" ?!.,;:\"'")
+
+
+class SearchCache:
+    """
+    Two-tier cache for search results: an in-memory LRU in front of SQLite.
+    Entries are (backend, result) pairs; result is None for negative entries.
+    Expired rows are deleted from SQLite on open and every PRUNE_EVERY puts, and
+    beyond max_disk_entries rows the ones closest to expiry go first.
+    """
+
+    def __init__(self, path=None, max_entries=1024, ttls=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "pruned": 0,
+        }
+        self._puts = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, backend TEXT NOT NULL, result TEXT, expires_at REAL NOT NULL)"
+            )
+            self._prune()
+
+    def get(self, query):
+        """
+        Return the cached (backend, result) for a query, or None on a miss.
+        """
+        key = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                backend, result, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", result)
+                    return backend, result
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT backend, result, expires_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    backend, result, expires_at = row
+                    if expires_at > now:
+                        self._remember(key, backend, result, expires_at)
+                        self._record_hit("disk_hits", result)
+                        return backend, result
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query, backend, result):
+        """
+        Store a result under the TTL of the backend that produced it.
+        Pass backend="none" and result=None to cache a miss.
+        """
+        key = normalize_query(query)
+        expires_at = time.time() + self.ttls.get(backend, self.ttls["none"])
+
+        with self._lock:
+            self._remember(key, backend, result, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, backend, result, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, backend, result, expires_at),
+                )
+                self._puts += 1
+                if self._puts % PRUNE_EVERY == 0:
+                    self._prune()
+                else:
+                    self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _prune(self):
+        """Delete expired rows, then the rows closest to expiry beyond max_disk_entries"""
+        pruned = self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        if self.max_disk_entries is not None:
+            pruned += self._db.execute(
+                "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,)
+            ).rowcount
+        self._db.commit()
+        self.stats["pruned"] += pruned
+
+    def _record_hit(self, tier, result):
+        self.stats["hits"] += 1
+        self.stats[tier] += 1
+        if result is None:
+            self.stats["negative_hits"] += 1
+
+    def _remember(self, key, backend, result, expires_at):
+        self._memory[key] = (backend, result, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_search_cache():
+    """
+    Return the process-wide search cache, creating it on first use.
+    SEARCH_CACHE_PATH sets the SQLite file (default ReAct/.search_cache.sqlite, wherever
+    the process starts); set it to an empty string for a memory-only cache.
+    SEARCH_CACHE_MAX_ENTRIES bounds the memory tier, SEARCH_CACHE_MAX_DISK_ENTRIES the file.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            here = os.path.dirname(os.path.abspath(__file__))
+            path = os.getenv("SEARCH_CACHE_PATH", os.path.join(here, ".search_cache.sqlite"))
+            max_entries = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+            max_disk_entries = int(os.getenv("SEARCH_CACHE_MAX_DISK_ENTRIES", "100000"))
+            _default_cache = SearchCache(path or None, max_entries=max_entries, max_disk_entries=max_disk_entries)
+        return _default_cache
+
+
+def set_search_cache(cache):
+    """
+    Replace the process-wide search cache (None recreates the default on next use).
+    """
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
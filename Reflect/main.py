@@ -1,37 +1,108 @@
-import openai
+import contextvars
+import json
 import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.answer_cache import get_answer_cache
+from shared.errors import LLMError
+from shared.openai_client import OpenAIClient
+from shared.similarity import text_similarity
+from shared.steps import emit_step, step_sink
+from shared.tracing import span
+
 # Load environment variables
 load_dotenv()
 
+# How good a reviewer verdict is, for choosing between candidate answers
+VERDICT_SCORES = {"CORRECT": 1.0, "INCOMPLETE": 0.5, "INCORRECT": 0.0}
+
+# Extra instructions that make speculative candidates differ; the first candidate uses none
+CANDIDATE_STYLES = (
+    None,
+    "Reason step by step before giving the final answer.",
+    "Be concise and lead with the direct answer.",
+    "Include a concrete example or supporting detail.",
+    "Consider alternative interpretations of the question before answering.",
+)
+
+def verdict_score(reflection):
+    """Score a reviewer response by its leading verdict"""
+    for verdict, score in VERDICT_SCORES.items():
+        if reflection.strip().upper().startswith(verdict):
+            return score
+    return VERDICT_SCORES["INCOMPLETE"]
+
+def is_correct(reflection):
+    """Whether a reviewer response accepts the answer; same parsing as verdict_score"""
+    return verdict_score(reflection) == VERDICT_SCORES["CORRECT"]
+
 class ReflectAgent:
-    def __init__(self, api_key=None):
-        if api_key:
-            openai.api_key = api_key
-        else:
-            openai.api_key = os.getenv('OPENAI_API_KEY')
-        
+    def __init__(self, api_key=None, num_candidates=1, batch_critique=False, speculative_correction=False,
+                 convergence_threshold=0.9, critique_threshold=0.8, use_answer_cache=False, on_step=None):
+        """
+        num_candidates > 1 enables speculative mode: candidates are generated and
+        critiqued concurrently and only the best one is refined further.
+        batch_critique reviews all candidates in one call; speculative_correction
+        starts correcting each candidate as soon as its own critique arrives.
+        The loop stops early once a correction is at least convergence_threshold
+        similar to the answer it replaced, or a critique at least critique_threshold
+        similar to the previous one (None disables either check).
+        use_answer_cache returns the stored final answer of a near-duplicate
+        question instead of running the loop (see shared/answer_cache.py).
+        on_step receives each step as an event dict (shared/steps.py): "status",
+        "draft" (initial, candidate and corrected answers), "reflection" and the
+        final "answer"; None reports to the current step sink, which prints.
+        """
+        if num_candidates < 1:
+            raise ValueError("num_candidates must be at least 1")
+        self.llm = OpenAIClient(api_key)
         self.max_reflections = 3
+        self.num_candidates = num_candidates
+        self.batch_critique = batch_critique
+        self.speculative_correction = speculative_correction
+        self.convergence_threshold = convergence_threshold
+        self.critique_threshold = critique_threshold
+        self.use_answer_cache = use_answer_cache
+        self.on_step = on_step
+        # Why the last run stopped: correct, converged, repeated_critique, max_reflections or cached
+        self.stop_reason = None
+        # The answer cache match ({"question", "score"}) the last run was served from, if any
+        self.cache_hit = None
+        self._executor = None
+        if num_candidates > 1:
+            self._executor = ThreadPoolExecutor(max_workers=2 * num_candidates, thread_name_prefix="reflect")
+    
+    def close(self):
+        """Shut down the candidate thread pool; speculative runs raise RuntimeError afterwards"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
     
-    def generate_initial_answer(self, question):
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _submit(self, fn, *args):
+        # Run in a copy of the caller's context so LLM usage lands on the current span
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+    
+    def generate_initial_answer(self, question, style=None):
         """Generate initial answer to the question"""
         system_prompt = """You are a helpful assistant. Answer the user's question accurately and completely."""
+        if style:
+            system_prompt += " " + style
         
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": question}
         ]
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error generating answer: {str(e)}"
+        return self.llm.chat(messages, temperature=0.7)
     
     def reflect_on_answer(self, question, answer):
         """Reflect on whether the answer is correct and complete"""
@@ -53,15 +124,33 @@ class ReflectAgent:
             {"role": "user", "content": f"Question: {question}\n\nAnswer: {answer}\n\nIs this answer correct and complete?"}
         ]
         
+        return self.llm.chat(messages, temperature=0.3)
+    
+    def reflect_on_candidates(self, question, answers):
+        """Review several candidate answers in one call; returns one reflection per answer, or None if unparseable"""
+        system_prompt = """You are a critical reviewer. You will be given a question and numbered candidate answers. Analyze each candidate independently: is it factually correct, does it fully address the question, and is it clear?
+        
+        Respond with a JSON object mapping each candidate number to its verdict:
+        - "CORRECT" if the answer is accurate and complete
+        - "INCORRECT: [specific issues]" if there are problems
+        - "INCOMPLETE: [missing information]" if more details are needed
+        Example: {"1": "CORRECT", "2": "INCOMPLETE: does not mention the date"}"""
+        
+        candidates = "\n\n".join(f"Candidate {i + 1}:\n{answer}" for i, answer in enumerate(answers))
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Question: {question}\n\n{candidates}\n\nReview every candidate."}
+        ]
+        
+        content = self.llm.chat(messages, temperature=0.3)
+        match = re.search(r"\{.*\}", content, re.DOTALL)
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.3
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error reflecting: {str(e)}"
+            verdicts = json.loads(match.group(0)) if match else None
+        except ValueError:
+            verdicts = None
+        if not isinstance(verdicts, dict) or any(str(i + 1) not in verdicts for i in range(len(answers))):
+            return None
+        return [str(verdicts[str(i + 1)]) for i in range(len(answers))]
     
     def generate_corrected_answer(self, question, original_answer, reflection):
         """Generate a corrected answer based on reflection feedback"""
@@ -78,47 +167,140 @@ class ReflectAgent:
             {"role": "user", "content": f"Question: {question}\n\nOriginal Answer: {original_answer}\n\nReflection: {reflection}\n\nPlease provide a corrected and improved answer."}
         ]
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error generating corrected answer: {str(e)}"
+        return self.llm.chat(messages, temperature=0.7)
     
     def run(self, question):
-        """Main Reflect loop: Answer -> Reflect -> Correct -> Repeat"""
-        print(f"Question: {question}")
-        print("-" * 50)
+        """Main Reflect loop: Answer -> Reflect -> Correct -> Repeat, traced as a "reflect.run" span"""
+        with span("reflect.run", candidates=self.num_candidates) as phase, step_sink(self.on_step):
+            self.stop_reason = None
+            self.cache_hit = None
+            if self.use_answer_cache:
+                hit = get_answer_cache().get("reflect", question)
+                if hit is not None:
+                    self.stop_reason = "cached"
+                    self.cache_hit = {"question": hit["question"], "score": hit["score"]}
+                    phase.set(stop_reason=self.stop_reason, cache_score=hit["score"])
+                    emit_step("status", f"Question: {question}")
+                    emit_step("status", f"Cached answer for '{hit['question']}' (similarity {hit['score']:.2f})",
+                              cached_question=hit["question"], score=hit["score"])
+                    emit_step("answer", f"\nFinal Answer: {hit['answer']}", answer=hit["answer"],
+                              stop_reason=self.stop_reason)
+                    return hit["answer"]
+            answer = self._run(question)
+            phase.set(stop_reason=self.stop_reason)
+            # Only answers the reviewer accepted (or stopped changing) are worth serving again
+            if self.use_answer_cache and self.stop_reason in ("correct", "converged"):
+                get_answer_cache().put("reflect", question, answer)
+            return answer
+    
+    def _speculate(self, question):
+        """
+        Generate num_candidates answers and critique them concurrently.
+        Returns the best (answer, reflection) and, with speculative_correction,
+        a future already correcting it (None if it needs no correction).
+        """
+        styles = [CANDIDATE_STYLES[i % len(CANDIDATE_STYLES)] for i in range(self.num_candidates)]
+        emit_step("status", f"Generating {self.num_candidates} candidate answers...")
+        with span("reflect.answer", candidates=self.num_candidates):
+            futures = [self._submit(self.generate_initial_answer, question, style) for style in styles]
+            answers = [future.result() for future in futures]
+        for i, answer in enumerate(answers):
+            emit_step("draft", f"Candidate {i + 1}: {answer}", stage="candidate", candidate=i, answer=answer)
         
-        # Generate initial answer
-        print("Generating initial answer...")
-        current_answer = self.generate_initial_answer(question)
-        print(f"Initial Answer: {current_answer}")
+        emit_step("status", "Reviewing candidates...")
+        corrections = {}
+        with span("reflect.reflect", round=0, candidates=self.num_candidates) as phase:
+            reflections = self.reflect_on_candidates(question, answers) if self.batch_critique else None
+            if reflections is None:
+                critiques = {self._submit(self.reflect_on_answer, question, answer): i
+                             for i, answer in enumerate(answers)}
+                reflections = [None] * len(answers)
+                for future in as_completed(critiques):
+                    i = critiques[future]
+                    reflections[i] = future.result()
+                    # Start fixing this candidate before knowing whether it will be chosen
+                    if self.speculative_correction and not is_correct(reflections[i]):
+                        corrections[i] = self._submit(self.generate_corrected_answer,
+                                                      question, answers[i], reflections[i])
+            # Highest verdict wins; ties go to the earlier candidate
+            best = max(range(len(answers)), key=lambda i: (verdict_score(reflections[i]), -i))
+            phase.set(chosen=best, correct=is_correct(reflections[best]))
+        
+        for i, future in corrections.items():
+            if i != best:
+                future.cancel()
+        emit_step("status", f"Selected candidate {best + 1}", candidate=best)
+        return answers[best], reflections[best], corrections.get(best)
+    
+    def _run(self, question):
+        emit_step("status", f"Question: {question}")
+        emit_step("status", "-" * 50)
+        
+        reflection = None
+        previous_reflection = None
+        correction = None
+        if self.num_candidates > 1:
+            current_answer, reflection, correction = self._speculate(question)
+        else:
+            # Generate initial answer
+            emit_step("status", "Generating initial answer...")
+            with span("reflect.answer"):
+                current_answer = self.generate_initial_answer(question)
+            emit_step("draft", f"Initial Answer: {current_answer}", stage="initial", answer=current_answer)
         
         for reflection_round in range(self.max_reflections):
-            print(f"\nReflection Round {reflection_round + 1}:")
+            emit_step("status", f"\nReflection Round {reflection_round + 1}:", round=reflection_round)
             
-            # Reflect on current answer
-            print("Reflecting on answer...")
-            reflection = self.reflect_on_answer(question, current_answer)
-            print(f"Reflection: {reflection}")
+            # Reflect on current answer, unless speculation already did
+            if reflection is None:
+                emit_step("status", "Reflecting on answer...", round=reflection_round)
+                with span("reflect.reflect", round=reflection_round) as phase:
+                    reflection = self.reflect_on_answer(question, current_answer)
+                    phase.set(correct=is_correct(reflection))
+            emit_step("reflection", f"Reflection: {reflection}", round=reflection_round, reflection=reflection,
+                      correct=is_correct(reflection))
             
             # Check if answer is correct
-            if reflection.startswith("CORRECT"):
-                print(f"\nFinal Answer: {current_answer}")
+            if is_correct(reflection):
+                self.stop_reason = "correct"
+                emit_step("answer", f"\nFinal Answer: {current_answer}", answer=current_answer,
+                          stop_reason=self.stop_reason)
+                return current_answer
+            
+            # The last correction did not address this critique; another attempt won't either
+            if (previous_reflection is not None and self.critique_threshold is not None
+                    and text_similarity(reflection, previous_reflection) >= self.critique_threshold):
+                self.stop_reason = "repeated_critique"
+                emit_step("answer", f"\nSame critique as last round. Final Answer: {current_answer}",
+                          answer=current_answer, stop_reason=self.stop_reason)
                 return current_answer
             
             # Generate corrected answer
-            print("Generating corrected answer...")
-            corrected_answer = self.generate_corrected_answer(question, current_answer, reflection)
-            print(f"Corrected Answer: {corrected_answer}")
+            emit_step("status", "Generating corrected answer...", round=reflection_round)
+            with span("reflect.correct", round=reflection_round):
+                if correction is not None:
+                    corrected_answer = correction.result()
+                else:
+                    corrected_answer = self.generate_corrected_answer(question, current_answer, reflection)
+            emit_step("draft", f"Corrected Answer: {corrected_answer}", stage="corrected", round=reflection_round,
+                      answer=corrected_answer)
             
+            # Answers have plateaued; further rounds would only rephrase
+            converged = (self.convergence_threshold is not None
+                         and text_similarity(corrected_answer, current_answer) >= self.convergence_threshold)
             current_answer = corrected_answer
+            if converged:
+                self.stop_reason = "converged"
+                emit_step("answer", f"\nAnswer converged. Final Answer: {current_answer}", answer=current_answer,
+                          stop_reason=self.stop_reason)
+                return current_answer
+            previous_reflection = reflection
+            reflection = None
+            correction = None
         
-        print(f"\nMax reflections reached. Final Answer: {current_answer}")
+        self.stop_reason = "max_reflections"
+        emit_step("answer", f"\nMax reflections reached. Final Answer: {current_answer}", answer=current_answer,
+                  stop_reason=self.stop_reason)
         return current_answer
 
 def main():
@@ -131,7 +313,10 @@ def main():
             break
         
         if user_input.strip():
-            agent.run(user_input)
+            try:
+                agent.run(user_input)
+            except LLMError as e:
+                print(f"\nError calling OpenAI API: {e}")
 
 if __name__ == "__main__":
     main()
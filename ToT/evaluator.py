@@ -0,0 +1,139 @@
+import ast
+import operator
+from fractions import Fraction
+from functools import lru_cache
+from typing import Optional, Tuple
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression uses anything but integers, + - * / and parentheses"""
+
+
+def _check(node):
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in _BINARY_OPS:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        _check(node.left)
+        _check(node.right)
+    elif isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, (ast.UAdd, ast.USub)):
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        _check(node.operand)
+    elif isinstance(node, ast.Constant):
+        if type(node.value) is not int:
+            raise ExpressionError(f"Unsupported literal: {node.value!r}")
+    else:
+        raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expression: str) -> Tuple[ast.AST, str]:
+    """Parse and validate an expression once; returns its AST and a structural key"""
+    try:
+        tree = ast.parse(expression.strip(), mode="eval").body
+    except SyntaxError as e:
+        raise ExpressionError(str(e)) from e
+    _check(tree)
+    return tree, ast.dump(tree)
+
+
+def _evaluate(node, known_key=None, known_value=None):
+    if known_key is not None and isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Constant)) \
+            and ast.dump(node) == known_key:
+        return known_value
+    if isinstance(node, ast.Constant):
+        return Fraction(node.value)
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, known_key, known_value)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    left = _evaluate(node.left, known_key, known_value)
+    right = _evaluate(node.right, known_key, known_value)
+    return _BINARY_OPS[type(node.op)](left, right)
+
+
+def evaluate_expression(expression: str) -> Optional[Fraction]:
+    """Exactly evaluate an expression; None if it is invalid or divides by zero"""
+    try:
+        tree, _ = compile_expression(expression)
+        return _evaluate(tree)
+    except (ExpressionError, ZeroDivisionError):
+        return None
+
+
+def evaluate_step(parent_expression: str, parent_value: Fraction, expression: str,
+                  remaining_numbers) -> Optional[Tuple[Fraction, int]]:
+    """Evaluate a child expression incrementally from its parent's value.
+
+    The child must contain the parent expression as a sub-expression and combine
+    it with exactly one of the remaining numbers. Returns (value, number used), or
+    None if the expression is not such a step.
+    """
+    try:
+        tree, _ = compile_expression(expression)
+        _, parent_key = compile_expression(parent_expression)
+    except ExpressionError:
+        return None
+
+    # Split the child into the parent sub-expression and the literals around it
+    literals = []
+    found_parent = False
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if not found_parent and ast.dump(node) == parent_key:
+            found_parent = True
+        elif isinstance(node, ast.BinOp):
+            stack.extend((node.right, node.left))
+        elif isinstance(node, ast.UnaryOp):
+            stack.append(node.operand)
+        else:
+            literals.append(node.value)
+
+    if not found_parent or len(literals) != 1 or literals[0] not in remaining_numbers:
+        return None
+
+    try:
+        value = _evaluate(tree, parent_key, parent_value)
+    except ZeroDivisionError:
+        return None
+    return value, literals[0]
+
+
+def _combine(a: Fraction, b: Fraction):
+    yield a + b
+    yield a - b
+    yield b - a
+    yield a * b
+    if b:
+        yield a / b
+    if a:
+        yield b / a
+
+
+@lru_cache(maxsize=65536)
+def _can_reach(value: Fraction, remaining: Tuple[int, ...], target: Fraction) -> bool:
+    # Every number has to be used, so hitting the target early doesn't count
+    if not remaining:
+        return value == target
+    for i, number in enumerate(remaining):
+        if i and remaining[i - 1] == number:
+            continue
+        rest = remaining[:i] + remaining[i + 1:]
+        for combined in _combine(value, Fraction(number)):
+            if _can_reach(combined, rest, target):
+                return True
+    return False
+
+
+def can_reach(value, remaining_numbers, target=24) -> bool:
+    """Whether folding all the remaining numbers into value one at a time can end at target"""
+    if value is None:
+        return False
+    return _can_reach(Fraction(value), tuple(sorted(remaining_numbers)), Fraction(target))
@@ -1,43 +1,187 @@
-import openai
 import os
+import contextvars
 import json
 import re
-from typing import List, Dict, Any
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.errors import LLMError
+from shared.openai_client import OpenAIClient
+from shared.steps import emit_step, step_sink
+from shared.tracing import span
+from search_strategies import VALUE_SCORES, distance_heuristic, make_frontier
+from transposition import TranspositionTable
+from evaluator import can_reach, evaluate_expression, evaluate_step
+from solver import known_solution, verify_solution
+
 # Load environment variables
 load_dotenv()
 
+def parse_thoughts(content: str) -> List[str]:
+    """Expressions from a reply that should be a JSON array, falling back to quoted strings"""
+    try:
+        thoughts = json.loads(content)
+        if isinstance(thoughts, list):
+            return [str(thought) for thought in thoughts if isinstance(thought, (str, int, float))]
+    except ValueError:
+        pass
+    return re.findall(r'["\']([^"\']+)["\']', content)
+
+def parse_batched_thoughts(content: str, node_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    Expressions per node id from a reply that should be a JSON object of arrays.
+    Ids the reply doesn't mention are left out, so the caller can retry them.
+    """
+    start, end = content.find("{"), content.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            thoughts = {}
+            for node_id in node_ids:
+                value = data.get(node_id)
+                if isinstance(value, (str, int, float)):
+                    value = [value]
+                if isinstance(value, list):
+                    thoughts[node_id] = [str(thought) for thought in value
+                                         if isinstance(thought, (str, int, float))]
+            return thoughts
+    
+    # Fallback for malformed JSON: find `"id": [ ... ]` for each id in the text
+    thoughts = {}
+    for node_id in node_ids:
+        match = re.search(r'["\']?\b%s\b["\']?\s*:\s*\[([^\]]*)\]' % re.escape(node_id), content)
+        if match:
+            thoughts[node_id] = re.findall(r'["\']([^"\']+)["\']', match.group(1))
+    return thoughts
+
 class ToTNode:
-    def __init__(self, expression: str, remaining_numbers: List[int], depth: int = 0):
-        self.expression = expression
-        self.remaining_numbers = remaining_numbers
+    """
+    One search state. Nodes are slotted and keep remaining numbers as a tuple; a
+    child whose expression contains its parent's stores only the text around it
+    (e.g. "{}*6") and rebuilds the full expression through its parent on demand.
+    """
+    __slots__ = ("parent", "step", "remaining_numbers", "depth", "children", "open_children",
+                 "evaluated", "value", "score")
+    
+    def __init__(self, expression: str, remaining_numbers, depth: int = 0, parent: Optional["ToTNode"] = None):
+        self.parent = parent
+        self.step = expression
+        if parent is not None and "{" not in expression and "}" not in expression:
+            parent_expression = parent.expression
+            if parent_expression in expression:
+                self.step = expression.replace(parent_expression, "{}", 1)
+        self.remaining_numbers = tuple(remaining_numbers)
         self.depth = depth
         self.children = []
+        # Children still waiting on the frontier or being explored; 0 once expanded means done
+        self.open_children = 0
         self.evaluated = False
         self.value = None
+        self.score = None
+    
+    @property
+    def expression(self) -> str:
+        steps = []
+        node = self
+        while node.parent is not None and "{}" in node.step:
+            steps.append(node.step)
+            node = node.parent
+        expression = node.step
+        for step in reversed(steps):
+            expression = step.replace("{}", expression, 1)
+        return expression
         
     def evaluate(self):
-        """Safely evaluate the mathematical expression"""
-        try:
-            # Only allow numbers, operators, and parentheses for security
-            if re.match(r'^[0-9+\-*/().\s]+$', self.expression):
-                self.value = eval(self.expression)
-                self.evaluated = True
-                return self.value
-        except:
-            pass
-        return None
+        """Exactly evaluate the mathematical expression as a Fraction"""
+        if not self.evaluated:
+            self.value = evaluate_expression(self.expression)
+            self.evaluated = self.value is not None
+        return self.value
 
 class ToTAgent:
-    def __init__(self, api_key=None):
-        if api_key:
-            openai.api_key = api_key
-        else:
-            openai.api_key = os.getenv('OPENAI_API_KEY')
+    def __init__(self, api_key=None, strategy: str = "bfs", beam_width: int = 3,
+                 max_llm_calls: Optional[int] = None, value_mode: str = "heuristic",
+                 max_workers: int = 1, use_transpositions: bool = True, use_oracle: bool = True,
+                 solver_mode: str = "verify", expansion_batch_size: int = 1, samples: int = 1,
+                 max_nodes: Optional[int] = None, on_step=None):
+        self.llm = OpenAIClient(api_key)
+        
+        if value_mode not in ("heuristic", "llm", "both"):
+            raise ValueError(f"Unknown value mode: {value_mode}")
+        # off: LLM search only; verify: skip unsolvable puzzles and check found solutions
+        # against the exhaustive solver; instant: also answer known puzzles without searching
+        if solver_mode not in ("off", "verify", "instant"):
+            raise ValueError(f"Unknown solver mode: {solver_mode}")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if expansion_batch_size < 1 or samples < 1:
+            raise ValueError("expansion_batch_size and samples must be at least 1")
         
         self.max_depth = 4
         self.max_branches = 3
+        self.target = 24
+        self.strategy = strategy
+        self.beam_width = beam_width
+        self.max_llm_calls = max_llm_calls
+        self.value_mode = value_mode
+        self.max_workers = max_workers
+        self.use_transpositions = use_transpositions
+        self.use_oracle = use_oracle
+        self.solver_mode = solver_mode
+        # Frontier nodes expanded by one LLM request, and completions sampled per request (the
+        # API's n parameter); with samples > 1 each completion proposes a share of the branches
+        self.expansion_batch_size = expansion_batch_size
+        self.samples = samples
+        # Cap on tree nodes kept alive during a search; past it, fully explored subtrees are dropped
+        # (their states leave the transposition table too, so they may be reached again)
+        self.max_nodes = max_nodes
+        self.live_nodes = 0
+        self.peak_nodes = 0
+        self.nodes_evicted = 0
+        # Canonical solution of the last puzzle according to the solver, if one exists
+        self.reference_solution = None
+        self.transpositions = TranspositionTable()
+        # Receives each step as an event dict (shared/steps.py); None prints them
+        self.on_step = on_step
+        self.llm_calls = 0
+        self.nodes_expanded = 0
+        self._llm_calls_lock = threading.Lock()
+        self._executor = None
+        
+    def _budget_exhausted(self) -> bool:
+        return self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls
+    
+    def _remaining_budget(self) -> Optional[int]:
+        if self.max_llm_calls is None:
+            return None
+        return max(self.max_llm_calls - self.llm_calls, 0)
+    
+    def _count_llm_call(self):
+        with self._llm_calls_lock:
+            self.llm_calls += 1
+    
+    def _map(self, fn, items):
+        """Apply fn to items with up to max_workers calls in flight; results keep item order"""
+        if self._executor is None or len(items) <= 1:
+            return [fn(item) for item in items]
+        # Each call runs in a copy of the caller's context so its spans nest under the current one
+        futures = [self._executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+    
+    def _branches_per_sample(self) -> int:
+        return -(-self.max_branches // self.samples)
+    
+    def _merge_samples(self, samples: List[List[str]]) -> List[str]:
+        """Distinct thoughts across sampled completions, in order, up to max_branches"""
+        thoughts = list(dict.fromkeys(thought.strip() for sample in samples for thought in sample))
+        return [thought for thought in thoughts if thought][:self.max_branches]
         
     def generate_thoughts(self, node: ToTNode) -> List[str]:
         """Generate multiple thought branches for the current node"""
@@ -55,125 +199,395 @@ Rules:
 Format your response as a JSON array of expressions:
 ["expression1", "expression2"]"""
 
-        user_prompt = f"Remaining numbers: {node.remaining_numbers}\nCurrent expression: '{node.expression}'\nGenerate {self.max_branches} next steps using exactly one number:"
+        branches = self._branches_per_sample()
+        user_prompt = f"Remaining numbers: {list(node.remaining_numbers)}\nCurrent expression: '{node.expression}'\nGenerate {branches} next steps using exactly one number:"
         
         messages = [
             {"role": "system", "content": system_prompt.format(
-                remaining=node.remaining_numbers,
+                remaining=list(node.remaining_numbers),
                 expression=node.expression,
-                max_branches=self.max_branches
+                max_branches=branches
             )},
             {"role": "user", "content": user_prompt}
         ]
         
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.8,
-                max_tokens=200
-            )
-            
-            content = response.choices[0].message.content.strip()
+            self._count_llm_call()
+            contents = self.llm.chat_choices(messages, n=self.samples, temperature=0.8, max_tokens=200)
+            return self._merge_samples([parse_thoughts(content.strip()) for content in contents])
             
-            # Try to parse as JSON
-            try:
-                thoughts = json.loads(content)
-                if isinstance(thoughts, list):
-                    return thoughts[:self.max_branches]
-            except:
-                pass
-            
-            # Fallback: extract expressions from text
-            expressions = re.findall(r'["\']([^"\']+)["\']', content)
-            return expressions[:self.max_branches]
-            
-        except Exception as e:
-            print(f"Error generating thoughts: {e}")
+        except LLMError as e:
+            emit_step("error", f"Error generating thoughts: {e}")
             return []
     
+    def generate_thoughts_batch(self, nodes: List[ToTNode]) -> List[List[str]]:
+        """Generate thoughts for several nodes with one request; returns one list per node"""
+        system_prompt = """You are a mathematical reasoning agent expanding several nodes of a search for {target} at once. Each node has its own current expression and remaining numbers.
+
+Rules:
+1. For each node, generate exactly {branches} different next steps
+2. Each step extends that node's current expression with ONE of that node's remaining numbers
+3. Use only +, -, *, /, and parentheses
+4. Examples: for a node whose current expression is "2" with remaining numbers [4,6,8], generate things like "2+4", "2*4", "4-2"
+
+Respond with a single JSON object mapping every node id to an array of its expressions:
+{{"n1": ["expression1", "expression2"], "n2": ["expression1", "expression2"]}}"""
+
+        branches = self._branches_per_sample()
+        node_ids = [f"n{i}" for i in range(1, len(nodes) + 1)]
+        lines = [f"Node {node_id}: current expression '{node.expression}', remaining numbers {list(node.remaining_numbers)}"
+                 for node_id, node in zip(node_ids, nodes)]
+        messages = [
+            {"role": "system", "content": system_prompt.format(target=self.target, branches=branches)},
+            {"role": "user", "content": "\n".join(lines) + f"\nGenerate {branches} next steps per node:"}
+        ]
+        
+        samples = {node_id: [] for node_id in node_ids}
+        try:
+            self._count_llm_call()
+            contents = self.llm.chat_choices(messages, n=self.samples, temperature=0.8,
+                                             max_tokens=50 + 25 * branches * len(nodes))
+            for content in contents:
+                for node_id, thoughts in parse_batched_thoughts(content, node_ids).items():
+                    samples[node_id].append(thoughts)
+        except LLMError as e:
+            emit_step("error", f"Error generating thoughts: {e}")
+            return [[] for _ in nodes]
+        
+        results = []
+        for node_id, node in zip(node_ids, nodes):
+            if samples[node_id]:
+                results.append(self._merge_samples(samples[node_id]))
+            elif self._budget_exhausted():
+                results.append([])
+            else:
+                # The reply skipped this node; ask for it on its own
+                emit_step("status", f"Batched reply had no thoughts for '{node.expression}'; retrying it alone",
+                          expression=node.expression)
+                results.append(self.generate_thoughts(node))
+        return results
+    
+    def evaluate_state(self, node: ToTNode) -> str:
+        """Ask the LLM whether the node can still reach the target: sure/likely/impossible"""
+        system_prompt = """You are evaluating partial solutions to the 24 game. Given the current expression and the numbers that are still unused, judge whether combining the current value with all remaining numbers (one at a time, using +, -, *, /) can reach {target}.
+
+Respond with exactly one word:
+- "sure" if you can see a way to reach {target}
+- "likely" if reaching {target} seems plausible
+- "impossible" if the values are clearly too large, too small or otherwise unreachable"""
+        
+        messages = [
+            {"role": "system", "content": system_prompt.format(target=self.target)},
+            {"role": "user", "content": f"Current expression: '{node.expression}' = {node.value}\nRemaining numbers: {list(node.remaining_numbers)}"}
+        ]
+        
+        try:
+            self._count_llm_call()
+            with span("tot.evaluate", depth=node.depth, expression=node.expression):
+                content = self.llm.chat(messages, temperature=0.0, max_tokens=5).strip().lower()
+            for verdict in VALUE_SCORES:
+                if verdict in content:
+                    return verdict
+        except LLMError as e:
+            emit_step("error", f"Error evaluating state: {e}", expression=node.expression)
+        
+        return "likely"
+    
+    def _uses_llm_value(self) -> bool:
+        # BFS ignores scores, so LLM evaluations would be wasted calls
+        return self.value_mode != "heuristic" and self.strategy != "bfs"
+    
+    def score_node(self, node: ToTNode, use_llm: bool = True) -> Optional[float]:
+        """Rank a node for the frontier; returns None if the branch should be pruned"""
+        heuristic = distance_heuristic(node.value, self.target)
+        if not use_llm or not self._uses_llm_value():
+            node.score = heuristic
+            return node.score
+        
+        verdict = self.evaluate_state(node)
+        if verdict == "impossible":
+            return None
+        
+        if self.value_mode == "llm":
+            node.score = VALUE_SCORES[verdict]
+        else:
+            node.score = (heuristic + VALUE_SCORES[verdict]) / 2
+        return node.score
+    
     def create_child_nodes(self, parent: ToTNode, thoughts: List[str]) -> List[ToTNode]:
         """Create child nodes from generated thoughts"""
         children = []
         
         for thought in thoughts:
-            # Extract numbers used in the thought
-            used_numbers = [int(x) for x in re.findall(r'\b\d+\b', thought)]
+            # Check the thought extends the parent with exactly one remaining number,
+            # evaluating it from the parent's value rather than from scratch
+            step = evaluate_step(parent.expression, parent.value, thought, parent.remaining_numbers)
             
-            # Check if exactly one number from remaining is used
-            remaining_used = [num for num in used_numbers if num in parent.remaining_numbers]
-            
-            if len(remaining_used) == 1:
-                new_remaining = parent.remaining_numbers.copy()
-                new_remaining.remove(remaining_used[0])
+            if step is not None:
+                value, used = step
+                index = parent.remaining_numbers.index(used)
+                new_remaining = parent.remaining_numbers[:index] + parent.remaining_numbers[index + 1:]
                 
-                child = ToTNode(thought, new_remaining, parent.depth + 1)
+                child = ToTNode(thought, new_remaining, parent.depth + 1, parent)
+                child.value = value
+                child.evaluated = True
                 children.append(child)
         
         return children
     
+    def _is_solution(self, node: ToTNode) -> bool:
+        """Only a complete expression counts; one hitting the target with numbers left is still expanded"""
+        return not node.remaining_numbers and node.value is not None and node.value == self.target
+    
+    def _expand(self, node: ToTNode) -> List[ToTNode]:
+        """Generate and build the children of one node"""
+        with self._llm_calls_lock:
+            self.nodes_expanded += 1
+        with span("tot.expand", depth=node.depth, expression=node.expression) as phase:
+            thoughts = self.generate_thoughts(node)
+            children = self.create_child_nodes(node, thoughts)
+            phase.set(thoughts=len(thoughts), children=len(children))
+        node.children = children
+        return children
+    
+    def _expand_batch(self, nodes: List[ToTNode]) -> List[List[ToTNode]]:
+        """Generate the children of several nodes with one request"""
+        if len(nodes) == 1:
+            return [self._expand(nodes[0])]
+        with self._llm_calls_lock:
+            self.nodes_expanded += len(nodes)
+        with span("tot.expand_batch", nodes=len(nodes), depths=[node.depth for node in nodes]) as phase:
+            batch_thoughts = self.generate_thoughts_batch(nodes)
+            # Each node's thoughts are checked against its own expression and remaining numbers,
+            # so steps the model filed under the wrong id are dropped here
+            expansions = [self.create_child_nodes(node, thoughts) for node, thoughts in zip(nodes, batch_thoughts)]
+            phase.set(thoughts=sum(len(thoughts) for thoughts in batch_thoughts),
+                      children=sum(len(children) for children in expansions))
+        for node, children in zip(nodes, expansions):
+            node.children = children
+        return expansions
+    
+    def _expand_all(self, batch: List[ToTNode]) -> List[List[ToTNode]]:
+        """Expand a batch of nodes, expansion_batch_size per request; children come back in batch order"""
+        if self.expansion_batch_size == 1:
+            return self._map(self._expand, batch)
+        size = self.expansion_batch_size
+        groups = [batch[i:i + size] for i in range(0, len(batch), size)]
+        return [children for expansions in self._map(self._expand_batch, groups) for children in expansions]
+    
+    def _close(self, node: ToTNode):
+        """Mark a node fully explored, then any ancestors this completes, evicting while over max_nodes"""
+        while node is not None:
+            if self.max_nodes is not None and self.live_nodes > self.max_nodes:
+                self._evict(node)
+            parent = node.parent
+            if parent is None:
+                return
+            parent.open_children -= 1
+            if parent.open_children > 0:
+                return
+            node = parent
+    
+    def _evict(self, node: ToTNode):
+        """Drop the explored subtree under a node; only nodes it owns are counted, not merged states"""
+        stack = [child for child in node.children if child.parent is node]
+        node.children = []
+        while stack:
+            child = stack.pop()
+            stack.extend(grandchild for grandchild in child.children if grandchild.parent is child)
+            child.children = []
+            if self.use_transpositions:
+                self.transpositions.discard(child)
+            self.live_nodes -= 1
+            self.nodes_evicted += 1
+    
     def search_tree(self, numbers: List[int]) -> List[ToTNode]:
-        """Search the tree of thoughts to find solutions"""
+        """
+        Search the tree of thoughts to find solutions, traced as a "tot.search" span.
+        Steps are reported to on_step (or the current step sink) as "expansion"
+        events, one per expanded node with its children, "thought" events per child,
+        and "solution", "prune", "status" and "error" events.
+        """
+        with span("tot.search", numbers=list(numbers), strategy=self.strategy) as phase, step_sink(self.on_step):
+            if self.max_workers > 1:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    self._executor = executor
+                    try:
+                        solutions = self._search(numbers)
+                    finally:
+                        self._executor = None
+            else:
+                solutions = self._search(numbers)
+            stats = self.transpositions.stats()
+            phase.set(solutions=len(solutions), nodes_expanded=self.nodes_expanded,
+                      peak_nodes=self.peak_nodes, nodes_evicted=self.nodes_evicted,
+                      transposition_lookups=stats["lookups"], transposition_hits=stats["hits"],
+                      transposition_hit_rate=round(stats["hit_rate"], 4))
+            return solutions
+    
+    def _search(self, numbers: List[int]) -> List[ToTNode]:
         # Start with first number as initial expression
         root = ToTNode(str(numbers[0]), numbers[1:], 0)
-        queue = [root]
+        root.evaluate()
+        root.score = distance_heuristic(root.value, self.target)
+        frontier = make_frontier(self.strategy, self.beam_width, on_drop=self._close)
+        frontier.push(root, root.score)
         solutions = []
+        self.llm_calls = 0
+        self.nodes_expanded = 0
+        self.live_nodes = self.peak_nodes = 1
+        self.nodes_evicted = 0
+        self.transpositions.clear()
+        self.reference_solution = None
+        if self.use_transpositions:
+            self.transpositions.lookup_or_insert(root)
+        
+        if self.solver_mode != "off":
+            solvable, self.reference_solution = known_solution(numbers, self.target)
+            if not solvable:
+                emit_step("status", f"{numbers} has no solution for {self.target}; skipping search")
+                return solutions
+            if self.solver_mode == "instant":
+                emit_step("solution", f"  ✓ KNOWN SOLUTION: {self.reference_solution} = {self.target}",
+                          expression=self.reference_solution, known=True)
+                node = ToTNode(self.reference_solution, [], len(numbers) - 1)
+                node.evaluate()
+                return [node]
         
-        while queue and len(solutions) < 5:  # Limit solutions
-            current = queue.pop(0)
+        if self.use_oracle and not can_reach(root.value, root.remaining_numbers, self.target):
+            emit_step("status", f"{self.target} cannot be reached from {numbers}; skipping search")
+            return solutions
+        
+        while frontier and len(solutions) < 5:  # Limit solutions
+            # Take up to max_workers requests' worth of nodes off the frontier to expand together
+            batch = []
+            for current in frontier.pop_batch(self.max_workers * self.expansion_batch_size):
+                # Skip if too deep
+                if current.depth >= self.max_depth:
+                    self._close(current)
+                    continue
+                
+                # Skip if no remaining numbers
+                if not current.remaining_numbers:
+                    # Evaluate final expression
+                    value = current.evaluate()
+                    emit_step("status", f"Final expression: {current.expression} = {value}",
+                              expression=current.expression, value=str(value))
+                    if self._is_solution(current):
+                        solutions.append(current)
+                        emit_step("solution", f"  ✓ SOLUTION FOUND: {current.expression} = {self.target}",
+                                  expression=current.expression)
+                    self._close(current)
+                    continue
+                
+                batch.append(current)
             
-            # Skip if too deep
-            if current.depth >= self.max_depth:
+            if not batch:
                 continue
             
-            # Skip if no remaining numbers
-            if not current.remaining_numbers:
-                # Evaluate final expression
-                value = current.evaluate()
-                print(f"Final expression: {current.expression} = {value}")
-                if value == 24 or (value is not None and abs(value - 24) < 0.001):
-                    solutions.append(current)
-                    print(f"  ✓ SOLUTION FOUND: {current.expression} = 24")
-                continue
+            budget = self._remaining_budget()
+            if budget == 0:
+                emit_step("status", f"LLM call budget of {self.max_llm_calls} exhausted")
+                break
+            if budget is not None:
+                batch = batch[:budget * self.expansion_batch_size]
             
-            # Generate thoughts for current node
-            thoughts = self.generate_thoughts(current)
-            print(f"Depth {current.depth}: Generated {len(thoughts)} thoughts")
+            # Generate thoughts for the batch; children come back in batch order
+            expansions = self._expand_all(batch)
             
-            # Create child nodes
-            children = self.create_child_nodes(current, thoughts)
-            current.children = children
+            to_score = []
+            for current, children in zip(batch, expansions):
+                self.live_nodes += len(children)
+                emit_step("expansion", f"Depth {current.depth}: Generated {len(children)} thoughts",
+                          depth=current.depth, expression=current.expression,
+                          children=[{"expression": child.expression, "value": str(child.value)} for child in children])
+                for i, child in enumerate(children):
+                    emit_step("thought", f"  Expression: {child.expression} = {child.value}",
+                              depth=child.depth, expression=child.expression, value=str(child.value))
+                    if self._is_solution(child):
+                        solutions.append(child)
+                        emit_step("solution", f"  ✓ SOLUTION FOUND: {child.expression} = {self.target}",
+                                  expression=child.expression)
+                        continue
+                    
+                    # Drop states from which the target is arithmetically unreachable
+                    # before any LLM call is spent on them
+                    if self.use_oracle and not can_reach(child.value, child.remaining_numbers, self.target):
+                        emit_step("prune", f"  ✗ Unreachable: {child.expression}", expression=child.expression,
+                                  reason="unreachable")
+                        continue
+                    
+                    # Merge states already reached by another expression so the
+                    # original node's expansion is shared instead of paid for again
+                    existing = self.transpositions.lookup_or_insert(child) if self.use_transpositions else None
+                    if existing is not None:
+                        current.children[i] = existing
+                        self.live_nodes -= 1
+                        emit_step("prune", f"  ↺ Same state as: {existing.expression}", expression=child.expression,
+                                  reason="transposition", same_as=existing.expression)
+                        continue
+                    
+                    to_score.append(child)
             
-            for child in children:
-                # Evaluate the expression
-                value = child.evaluate()
-                print(f"  Expression: {child.expression} = {value}")
-                
-                if value == 24:
-                    solutions.append(child)
-                    print(f"  ✓ SOLUTION FOUND: {child.expression} = 24")
-                elif value is not None and abs(value - 24) < 0.001:
-                    solutions.append(child)
-                    print(f"  ✓ SOLUTION FOUND: {child.expression} = {value}")
-                else:
-                    # Add to queue for further exploration
-                    queue.append(child)
+            # Only the first children in generation order get LLM evaluations the
+            # budget can pay for, so the outcome doesn't depend on thread timing
+            budget = self._remaining_budget()
+            llm_slots = len(to_score) if budget is None else budget
+            scores = self._map(lambda item: self.score_node(item[1], use_llm=item[0] < llm_slots),
+                               list(enumerate(to_score)))
+            
+            # Add to frontier for further exploration
+            scored = []
+            for child, score in zip(to_score, scores):
+                if score is None:
+                    emit_step("prune", f"  ✗ Pruned: {child.expression}", expression=child.expression, reason="score")
+                    continue
+                scored.append((child, score))
+            frontier.extend(scored)
+            
+            # A node is done once none of its children went on to the frontier
+            for child, _ in scored:
+                child.parent.open_children += 1
+            for current in batch:
+                if current.open_children == 0:
+                    self._close(current)
+            self.peak_nodes = max(self.peak_nodes, self.live_nodes)
+        
+        if self.use_transpositions:
+            stats = self.transpositions.stats()
+            emit_step("status", f"Transposition table: {stats['hits']}/{stats['lookups']} duplicate states merged "
+                                f"({stats['hit_rate']:.0%} hit rate)")
+        if self.nodes_evicted:
+            emit_step("status", f"Kept at most {self.peak_nodes} nodes; evicted {self.nodes_evicted} from explored subtrees")
+        # Release the tree; only the solutions and their ancestors stay reachable
+        self.transpositions.release()
+        
+        if self.solver_mode != "off":
+            verified = [node for node in solutions if verify_solution(node.expression, numbers, self.target)]
+            for node in solutions:
+                if node not in verified:
+                    emit_step("prune", f"  ✗ Rejected by verifier: {node.expression}", expression=node.expression,
+                              reason="verifier")
+            solutions = verified
+            if not solutions and self.reference_solution:
+                emit_step("status", f"Search missed the known solution: {self.reference_solution} = {self.target}")
         
         return solutions
     
     def solve_24_game(self, numbers: List[int] = [2, 4, 6, 8]):
         """Main method to solve the 24 game using Tree of Thoughts"""
-        print(f"Solving 24 game with numbers: {numbers}")
-        print("=" * 50)
-        
-        solutions = self.search_tree(numbers)
-        
-        if solutions:
-            print(f"\nFound {len(solutions)} solution(s):")
-            for i, solution in enumerate(solutions, 1):
-                print(f"{i}. {solution.expression} = 24")
-        else:
-            print("\nNo solutions found within the search depth.")
+        with step_sink(self.on_step):
+            emit_step("status", f"Solving 24 game with numbers: {numbers}")
+            emit_step("status", "=" * 50)
+            
+            solutions = self.search_tree(numbers)
+            
+            if solutions:
+                lines = [f"{i}. {solution.expression} = 24" for i, solution in enumerate(solutions, 1)]
+                emit_step("answer", "\n".join([f"\nFound {len(solutions)} solution(s):"] + lines),
+                          solutions=[solution.expression for solution in solutions])
+            else:
+                emit_step("answer", "\nNo solutions found within the search depth.", solutions=[])
         
         return solutions
 
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+from collections import deque
+
+# Scores assigned to the LLM value evaluator's verdicts
+VALUE_SCORES = {
+    "sure": 1.0,
+    "likely": 0.5,
+    "impossible": 0.0,
+}
+
+
+def distance_heuristic(value, target=24):
+    """Cheap numeric value function: 1.0 at the target, decaying with distance"""
+    if value is None:
+        return 0.0
+    return 1.0 / (1.0 + abs(float(value) - target))
+
+
+class Frontier:
+    """Container of nodes waiting to be expanded by ToTAgent.search_tree"""
+
+    def push(self, node, score=0.0):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def extend(self, scored_nodes):
+        """Push (node, score) pairs produced by one expansion"""
+        for node, score in scored_nodes:
+            self.push(node, score)
+
+    def pop_batch(self, limit):
+        """Pop up to `limit` nodes that can be expanded independently of each other"""
+        batch = []
+        while self and len(batch) < limit:
+            batch.append(self.pop())
+        return batch
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class BFSFrontier(Frontier):
+    """Breadth-first: expand every node at a depth before going deeper"""
+
+    def __init__(self):
+        self._queue = deque()
+
+    def push(self, node, score=0.0):
+        self._queue.append(node)
+
+    def pop(self):
+        return self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class DFSFrontier(Frontier):
+    """Depth-first: follow the most promising child of the last expansion first"""
+
+    def __init__(self):
+        self._stack = []
+
+    def push(self, node, score=0.0):
+        self._stack.append(node)
+
+    def pop(self):
+        return self._stack.pop()
+
+    def extend(self, scored_nodes):
+        # Push worst first so the best child sits on top of the stack; ties keep
+        # generation order because sorted() is stable over the reversed list
+        ordered = sorted(reversed(list(scored_nodes)), key=lambda item: item[1])
+        for node, score in ordered:
+            self.push(node, score)
+
+    def __len__(self):
+        return len(self._stack)
+
+
+class BestFirstFrontier(Frontier):
+    """Best-first: always expand the highest-scoring node seen so far"""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def push(self, node, score=0.0):
+        # The counter breaks ties in insertion order and keeps nodes uncompared
+        heapq.heappush(self._heap, (-score, next(self._counter), node))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class BeamFrontier(Frontier):
+    """
+    Beam search: expand a layer at a time, keeping only the best `width` nodes.
+    Nodes cut from a layer are passed to on_drop, if given.
+    """
+
+    def __init__(self, width=3, on_drop=None):
+        if width < 1:
+            raise ValueError("Beam width must be at least 1")
+        self.width = width
+        self.on_drop = on_drop
+        self._layer = deque()
+        self._next = []
+        self._counter = itertools.count()
+
+    def push(self, node, score=0.0):
+        self._next.append((-score, next(self._counter), node))
+
+    def _promote(self):
+        ranked = sorted(self._next)
+        self._layer = deque(node for _, _, node in ranked[:self.width])
+        self._next = []
+        if self.on_drop is not None:
+            for _, _, node in ranked[self.width:]:
+                self.on_drop(node)
+
+    def pop(self):
+        if not self._layer:
+            self._promote()
+        return self._layer.popleft()
+
+    def pop_batch(self, limit):
+        # Never cross into the next layer: it is only complete once every node
+        # of the current layer has been expanded
+        if not self._layer:
+            self._promote()
+        batch = []
+        while self._layer and len(batch) < limit:
+            batch.append(self._layer.popleft())
+        return batch
+
+    def __len__(self):
+        return len(self._layer) + min(len(self._next), self.width)
+
+
+STRATEGIES = {
+    "bfs": BFSFrontier,
+    "dfs": DFSFrontier,
+    "best_first": BestFirstFrontier,
+    "beam": BeamFrontier,
+}
+
+
+def make_frontier(strategy="bfs", beam_width=3, on_drop=None):
+    """Create the frontier for a named search strategy; on_drop sees nodes a beam discards"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {strategy} (choose from {', '.join(STRATEGIES)})")
+    if strategy == "beam":
+        return BeamFrontier(beam_width, on_drop)
+    return STRATEGIES[strategy]()
@@ -0,0 +1,316 @@
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+from fractions import Fraction
+from functools import lru_cache
+from itertools import combinations_with_replacement
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from evaluator import ExpressionError, compile_expression, evaluate_expression
+
+# Order in which every split (A, B) is combined; templates and values follow it
+_OPS = ("+", "*", "-", "-r", "/", "/r")
+_TOLERANCE = 1e-6
+
+
+def _splits(mask: int):
+    """Each unordered split of a subset bitmask into two non-empty parts, once"""
+    low = mask & -mask
+    sub = (mask - 1) & mask
+    while sub:
+        if sub & low:
+            yield sub, mask ^ sub
+        sub = (sub - 1) & mask
+
+
+def _combine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """All six operator results of every pair of columns of a and b, stacked in _OPS order"""
+    a = a[:, :, None]
+    b = b[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        results = (a + b, a * b, a - b, b - a, a / b, b / a)
+    rows = a.shape[0]
+    return np.concatenate([r.reshape(rows, -1) for r in results], axis=1)
+
+
+def _combine_templates(left: List[str], right: List[str]) -> List[str]:
+    templates = []
+    for op in _OPS:
+        for a in left:
+            for b in right:
+                if op.endswith("r"):
+                    templates.append(f"({b}{op[0]}{a})")
+                else:
+                    templates.append(f"({a}{op}{b})")
+    return templates
+
+
+@lru_cache(maxsize=8)
+def expression_templates(count: int) -> Tuple[str, ...]:
+    """
+    Every expression over `count` numbers, as format strings with {0}..{n-1} placeholders,
+    in the column order evaluate_all() produces
+    """
+    templates = {1 << i: ["{%d}" % i] for i in range(count)}
+    for mask in range(1, 1 << count):
+        if mask in templates:
+            continue
+        combined = []
+        for left, right in _splits(mask):
+            combined += _combine_templates(templates[left], templates[right])
+        templates[mask] = combined
+    return tuple(t[1:-1] if t.startswith("(") else t for t in templates[(1 << count) - 1])
+
+
+def evaluate_all(puzzles: np.ndarray) -> np.ndarray:
+    """
+    Values of every expression template for a batch of puzzles.
+    puzzles is (P, n); the result is (P, len(expression_templates(n))) floats, with
+    inf/nan where a division by zero occurred.
+    """
+    puzzles = np.asarray(puzzles, dtype=np.float64)
+    count = puzzles.shape[1]
+    values = {1 << i: puzzles[:, i:i + 1] for i in range(count)}
+    for mask in range(1, 1 << count):
+        if mask in values:
+            continue
+        values[mask] = np.concatenate([_combine(values[left], values[right])
+                                       for left, right in _splits(mask)], axis=1)
+    return values[(1 << count) - 1]
+
+
+def expression_numbers(expression: str) -> Optional[List[int]]:
+    """Sorted integer literals of an expression; None if it does not parse"""
+    try:
+        tree, _ = compile_expression(expression)
+    except ExpressionError:
+        return None
+    return sorted(node.value for node in ast.walk(tree) if isinstance(node, ast.Constant))
+
+
+def verify_solution(expression: str, numbers: Sequence[int], target=24) -> bool:
+    """Whether expression uses exactly the given numbers, each once, and equals target exactly"""
+    if expression_numbers(expression) != sorted(numbers):
+        return False
+    value = evaluate_expression(expression)
+    return value is not None and value == Fraction(target)
+
+
+def _exact_hits(numbers: Sequence[int], values: np.ndarray, templates: Tuple[str, ...], target, limit=None):
+    """Expressions whose float value is near target and which verify exactly, in template order"""
+    solutions = []
+    seen = set()
+    for column in np.flatnonzero(np.abs(values - target) < _TOLERANCE):
+        expression = templates[column].format(*numbers)
+        if expression not in seen and verify_solution(expression, numbers, target):
+            seen.add(expression)
+            solutions.append(expression)
+            if limit is not None and len(solutions) >= limit:
+                break
+    return solutions
+
+
+def solve(numbers: Sequence[int], target=24, limit: Optional[int] = None) -> List[str]:
+    """
+    Exhaustively solve one puzzle: every permutation, operator choice and
+    parenthesization is evaluated in a single vectorized pass. Returns distinct
+    exact solutions in canonical (template) order, at most limit of them.
+    """
+    numbers = sorted(numbers)
+    if not numbers:
+        return []
+    if len(numbers) == 1:
+        return [str(numbers[0])] if numbers[0] == target else []
+    values = evaluate_all(np.array([numbers]))[0]
+    return _exact_hits(numbers, values, expression_templates(len(numbers)), target, limit)
+
+
+def solve_batch(puzzles: Sequence[Sequence[int]], target=24) -> List[Tuple[Optional[str], float]]:
+    """
+    Solve many puzzles with the same number count at once.
+    Returns (canonical solution or None, fraction of all expressions that hit target) per puzzle;
+    the fraction is a difficulty score, lower being harder.
+    """
+    puzzles = [sorted(p) for p in puzzles]
+    if not puzzles:
+        return []
+    templates = expression_templates(len(puzzles[0]))
+    values = evaluate_all(np.array(puzzles))
+    near = np.abs(values - target) < _TOLERANCE
+    rates = near.mean(axis=1)
+
+    results = []
+    for row, numbers in enumerate(puzzles):
+        solution = None
+        if rates[row]:
+            hits = _exact_hits(numbers, values[row], templates, target, limit=1)
+            solution = hits[0] if hits else None
+        results.append((solution, float(rates[row]) if solution else 0.0))
+    return results
+
+
+class PuzzleIndex:
+    """
+    Every multiset of `size` numbers from low..high with its canonical solution
+    (or none) and solve rate, stored as one compressed .npz file.
+    """
+
+    def __init__(self, puzzles: np.ndarray, solutions: np.ndarray, rates: np.ndarray, target=24):
+        self.puzzles = puzzles
+        self.solutions = solutions
+        self.rates = rates
+        self.target = target
+        self.size = puzzles.shape[1]
+        self.low = int(puzzles.min())
+        self.high = int(puzzles.max())
+        self._rows: Dict[Tuple[int, ...], int] = {tuple(int(n) for n in p): i for i, p in enumerate(puzzles)}
+
+    @classmethod
+    def build(cls, low=1, high=13, size=4, target=24, batch_size=4096) -> "PuzzleIndex":
+        puzzles = np.array(list(combinations_with_replacement(range(low, high + 1), size)), dtype=np.int16)
+        solutions, rates = [], []
+        for start in range(0, len(puzzles), batch_size):
+            for solution, rate in solve_batch(puzzles[start:start + batch_size].tolist(), target):
+                solutions.append(solution or "")
+                rates.append(rate)
+        return cls(puzzles, np.array(solutions), np.array(rates, dtype=np.float32), target)
+
+    @classmethod
+    def load(cls, path: str) -> "PuzzleIndex":
+        with np.load(path) as data:
+            return cls(data["puzzles"], data["solutions"], data["rates"], int(data["target"]))
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, puzzles=self.puzzles, solutions=self.solutions,
+                                rates=self.rates, target=np.array(self.target))
+        os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        return len(self.puzzles)
+
+    def covers(self, numbers: Sequence[int], target=24) -> bool:
+        return target == self.target and tuple(sorted(numbers)) in self._rows
+
+    def lookup(self, numbers: Sequence[int]) -> Optional[Tuple[Optional[str], float]]:
+        """(canonical solution or None, solve rate) for an indexed puzzle, else None"""
+        row = self._rows.get(tuple(sorted(numbers)))
+        if row is None:
+            return None
+        solution = str(self.solutions[row])
+        return (solution or None), float(self.rates[row])
+
+    def dataset(self, count: int, solvable_fraction=0.75, min_rate=0.0, max_rate=1.0, seed=0) -> List[dict]:
+        """
+        Sample benchmark items: solvable puzzles with a solve rate in [min_rate, max_rate]
+        plus unsolvable ones, each scored with its solve rate, difficulty (0 easiest,
+        1 hardest) and a reference solution.
+        """
+        rng = random.Random(seed)
+        solvable = [i for i in range(len(self)) if self.solutions[i] and min_rate <= self.rates[i] <= max_rate]
+        unsolvable = [i for i in range(len(self)) if not self.solutions[i]]
+        wanted = round(count * solvable_fraction)
+        rows = rng.sample(solvable, min(wanted, len(solvable)))
+        rows += rng.sample(unsolvable, min(count - len(rows), len(unsolvable)))
+        rng.shuffle(rows)
+        # Difficulty is the percentile of the solve rate among all solvable puzzles
+        solvable_rates = np.sort(self.rates[[bool(s) for s in self.solutions]])
+        items = []
+        for n, row in enumerate(rows, 1):
+            solution = str(self.solutions[row]) or None
+            easier = np.searchsorted(solvable_rates, self.rates[row], side="right") / len(solvable_rates)
+            items.append({
+                "id": f"tot-{n}",
+                "numbers": [int(x) for x in self.puzzles[row]],
+                "solvable": solution is not None,
+                "solve_rate": round(float(self.rates[row]), 6),
+                "difficulty": round(1.0 - float(easier), 3) if solution else 1.0,
+                "solution": solution,
+            })
+        return items
+
+
+_index = None
+
+
+def get_puzzle_index() -> PuzzleIndex:
+    """
+    Return the 4-number puzzle index, loading it on first use.
+    PUZZLE_INDEX_PATH points at the .npz file; it is built there if missing.
+    """
+    global _index
+    if _index is None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        path = os.getenv("PUZZLE_INDEX_PATH", os.path.join(here, ".puzzle_index.npz"))
+        if os.path.exists(path):
+            _index = PuzzleIndex.load(path)
+        else:
+            _index = PuzzleIndex.build()
+            _index.save(path)
+    return _index
+
+
+def known_solution(numbers: Sequence[int], target=24) -> Tuple[bool, Optional[str]]:
+    """(solvable, canonical solution) from the index when it covers the puzzle, else by solving"""
+    index = get_puzzle_index()
+    if index.covers(numbers, target):
+        solution, _ = index.lookup(numbers)
+        return solution is not None, solution
+    solutions = solve(numbers, target, limit=1)
+    return bool(solutions), (solutions[0] if solutions else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive 24-game solver and puzzle index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = commands.add_parser("solve", help="list solutions of one puzzle")
+    solve_parser.add_argument("numbers", type=int, nargs="+")
+    solve_parser.add_argument("--target", type=int, default=24)
+    solve_parser.add_argument("--limit", type=int, default=10)
+
+    build_parser = commands.add_parser("build", help="precompute the index of all 4-number puzzles")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--low", type=int, default=1)
+    build_parser.add_argument("--high", type=int, default=13)
+    build_parser.add_argument("--target", type=int, default=24)
+
+    dataset_parser = commands.add_parser("dataset", help="write a scored benchmark dataset as JSONL")
+    dataset_parser.add_argument("output")
+    dataset_parser.add_argument("--count", type=int, default=20)
+    dataset_parser.add_argument("--solvable-fraction", type=float, default=0.75)
+    dataset_parser.add_argument("--min-rate", type=float, default=0.0, help="hardest allowed solve rate")
+    dataset_parser.add_argument("--max-rate", type=float, default=1.0, help="easiest allowed solve rate")
+    dataset_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "solve":
+        solutions = solve(args.numbers, args.target, args.limit)
+        for solution in solutions:
+            print(f"{solution} = {args.target}")
+        if not solutions:
+            print(f"No solution reaches {args.target}")
+    elif args.command == "build":
+        index = PuzzleIndex.build(args.low, args.high, target=args.target)
+        index.save(args.path)
+        solvable = sum(1 for s in index.solutions if s)
+        print(f"Indexed {len(index)} puzzles ({solvable} solvable) in {args.path}")
+    else:
+        items = get_puzzle_index().dataset(args.count, args.solvable_fraction, args.min_rate, args.max_rate,
+                                           args.seed)
+        with open(args.output, "w", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps(item) + "\n")
+        print(f"Wrote {len(items)} puzzles to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from fractions import Fraction
+
+
+def canonical_state(value, remaining_numbers):
+    """Key shared by every node with the same value and the same multiset of unused numbers"""
+    if value is None:
+        return None
+    return Fraction(value), tuple(sorted(remaining_numbers))
+
+
+class TranspositionTable:
+    """Maps canonical search states to the first node that reached them"""
+
+    def __init__(self):
+        self._table = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup_or_insert(self, node):
+        """Return the node already stored for this state, or store `node` and return None"""
+        key = canonical_state(node.value, node.remaining_numbers)
+        if key is None:
+            return None
+
+        self.lookups += 1
+        existing = self._table.get(key)
+        if existing is not None:
+            self.hits += 1
+            return existing
+
+        self._table[key] = node
+        return None
+
+    def discard(self, node):
+        """Forget the state stored for `node`, if `node` is the one stored"""
+        key = canonical_state(node.value, node.remaining_numbers)
+        if key is not None and self._table.get(key) is node:
+            del self._table[key]
+
+    def clear(self):
+        self._table.clear()
+        self.lookups = 0
+        self.hits = 0
+
+    def release(self):
+        """Drop the stored nodes but keep the lookup counters for stats()"""
+        self._table.clear()
+
+    def stats(self):
+        return {
+            "states": len(self._table),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._table)
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from shared.agents import AGENT_DIRS, close_agent, create_agent, run_agent
+from shared.steps import StepWriter, step_sink
+
+
+def read_items(path):
+    """Load input items from JSONL; items without an "id" are numbered by line"""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            elif isinstance(item, list):
+                item = {"numbers": item}
+            item.setdefault("id", line_number)
+            items.append(item)
+    return items
+
+
+def read_results(path):
+    """Records in an output file by id; a later record for an id (a retry) replaces earlier ones"""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run; the item will be redone
+                continue
+            results.pop(record["id"], None)
+            results[record["id"]] = record
+    return results
+
+
+def read_checkpoint(path, retry_errors=True):
+    """Ids already finished in an earlier run of the same output file"""
+    return {record_id for record_id, record in read_results(path).items()
+            if not (retry_errors and record.get("error"))}
+
+
+def compact_results(path):
+    """Rewrite an output file with one record per id, keeping the latest, if it has superseded lines"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        lines = sum(1 for line in f if line.strip())
+    results = read_results(path)
+    if lines == len(results):
+        return
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for record in results.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+class ResultWriter:
+    """Appends one JSON line per finished item, flushed immediately so it survives interruption"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a+", encoding="utf-8")
+        # Terminate a partial last line left by a crash so new records stay parseable
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(agent_name, items, output_path, workers=4, agent_kwargs=None, run_kwargs=None,
+              retry_errors=True, log=sys.stderr, on_step=None):
+    """
+    Run items through an agent on a pool of workers, streaming results to output_path.
+    Items already recorded there are skipped, so rerunning an interrupted job resumes it;
+    retried items replace their earlier error record once the run ends.
+    The agents' step events go to on_step (shared/steps.py; None prints them).
+    Returns counts of completed, failed and skipped items.
+    """
+    done = read_checkpoint(output_path, retry_errors)
+    pending = [item for item in items if item["id"] not in done]
+    counts = {"completed": 0, "failed": 0, "skipped": len(items) - len(pending)}
+    if counts["skipped"]:
+        print(f"Resuming: {counts['skipped']} of {len(items)} items already done", file=log)
+
+    # Agents keep per-run state, so every worker thread gets its own instance
+    local = threading.local()
+    agents = []
+
+    def process(item):
+        if not hasattr(local, "agent"):
+            local.agent = create_agent(agent_name, **(agent_kwargs or {}))
+            agents.append(local.agent)
+        record = {"id": item["id"], "agent": agent_name}
+        started = time.perf_counter()
+        try:
+            with step_sink(on_step):
+                record.update(run_agent(agent_name, local.agent, item, **(run_kwargs or {})))
+            record["error"] = None
+        except Exception as e:
+            # One bad item must not take the whole batch down
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["elapsed"] = round(time.perf_counter() - started, 3)
+        return record
+
+    writer = ResultWriter(output_path)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    written = set()
+
+    def record_result(future):
+        record = future.result()
+        writer.write(record)
+        written.add(future)
+        counts["failed" if record["error"] else "completed"] += 1
+        finished = counts["completed"] + counts["failed"]
+        print(f"[{finished}/{len(pending)}] {record['id']}: "
+              f"{'error: ' + record['error'] if record['error'] else 'ok'} ({record['elapsed']}s)", file=log)
+
+    try:
+        futures = [executor.submit(process, item) for item in pending]
+        for future in as_completed(futures):
+            record_result(future)
+    finally:
+        # On Ctrl-C, drop queued items but keep whatever was running when it finishes
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in futures:
+            if future not in written and future.done() and not future.cancelled():
+                record_result(future)
+        writer.close()
+        compact_results(output_path)
+        for agent in agents:
+            close_agent(agent)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run questions or puzzles from JSONL through an agent")
+    parser.add_argument("--agent", required=True, choices=sorted(AGENT_DIRS))
+    parser.add_argument("--input", required=True,
+                        help='JSONL of {"id", "question"} (react/reflect) or {"id", "numbers"} (tot)')
+    parser.add_argument("--output", required=True, help="results JSONL; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-iterations", type=int, help="ReAct iterations per question (react only)")
+    parser.add_argument("--no-retry-errors", action="store_true", help="on resume, skip items that failed")
+    parser.add_argument("--log", help="file for the agents' step-by-step output (discarded by default)")
+    args = parser.parse_args()
+
+    items = read_items(args.input)
+    with open(args.log or os.devnull, "a", encoding="utf-8") as agent_log:
+        run_kwargs = {"max_iterations": args.max_iterations} if args.max_iterations else None
+        counts = run_batch(args.agent, items, args.output, args.workers, run_kwargs=run_kwargs,
+                           retry_errors=not args.no_retry_errors,
+                           # Keep the agents' steps out of the progress output
+                           on_step=StepWriter(agent_log))
+    print(f"Done: {counts['completed']} completed, {counts['failed']} failed, {counts['skipped']} skipped",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+_WORDS = ("system", "result", "history", "energy", "process", "model", "theory", "network",
+          "structure", "language", "period", "region", "method", "value", "signal", "record")
+
+
+class MockServer:
+    """
+    Local stand-in for the OpenAI ChatCompletion API and the DuckDuckGo/Wikipedia
+    endpoints used by ReAct/search.py, for benchmarking without network access.
+
+    Replies are scripted (first rule whose "match" substring occurs in the last
+    user message wins) or generated from a seed and the request content, so the
+    same request always gets the same reply. Latency and injected 500/429 errors
+    are drawn from a seeded generator shared by all requests.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, seed=0, latency=0.05, jitter=0.5,
+                 error_rate=0.0, rate_limit_rate=0.0, search_latency=0.02,
+                 search_hit_rate=0.5, answer_rate=0.7, correct_rate=0.5, plateau_rate=0.0, script=None):
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.search_latency = search_latency
+        self.search_hit_rate = search_hit_rate
+        # Chance that ReAct answers once it has an observation / that a Reflect review passes
+        self.answer_rate = answer_rate
+        self.correct_rate = correct_rate
+        # Chance that a Reflect correction only appends to the original answer, as real ones do
+        # once they plateau; 0 keeps every correction a fresh text
+        self.plateau_rate = plateau_rate
+        self.script = list(script or [])
+
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def env(self):
+        """Environment variables that point the agents at this server"""
+        return {
+            "OPENAI_API_BASE": self.url + "/v1",
+            "DUCKDUCKGO_API_URL": self.url + "/duckduckgo/",
+            "WIKIPEDIA_API_URL": self.url + "/wikipedia/",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def draw(self):
+        """Next value from the shared generator, for latency and error injection"""
+        with self._lock:
+            return self._rng.random()
+
+    def delay(self, base):
+        if base > 0:
+            time.sleep(base * (1 + self.jitter * (2 * self.draw() - 1)))
+
+    def rng_for(self, *parts):
+        digest = hashlib.sha256(json.dumps([self.seed, *parts], sort_keys=True).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def reply(self, messages, n=1, index=0):
+        """Completion text for a chat request; index picks one of the n sampled choices"""
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        for rule in self.script:
+            if rule["match"] in user:
+                return rule["response"]
+
+        rng = self.rng_for(messages, n) if index == 0 else self.rng_for(messages, n, index)
+        if "expanding several nodes" in system:
+            return _tot_batch_steps(user, rng)
+        if "generate multiple possible next steps" in system:
+            return _tot_steps(user, rng)
+        if "evaluating partial solutions" in system:
+            return rng.choices(["sure", "likely", "impossible"], weights=[1, 3, 2])[0]
+        if "ReAct agent" in system:
+            return _react_thought(system, user, rng, self.answer_rate)
+        if "running summary" in system:
+            return "Summary: " + " ".join(user.split())[:300]
+        if "numbered candidate answers" in system:
+            count = len(re.findall(r"^Candidate \d+:", user, re.MULTILINE))
+            return json.dumps({str(i + 1): self._verdict(rng) for i in range(count)})
+        if "critical reviewer" in system:
+            return self._verdict(rng)
+        if "previous answer had issues" in system:
+            if self.plateau_rate and rng.random() < self.plateau_rate:
+                original = re.search(r"Original Answer: (.*?)\n\nReflection:", user, re.DOTALL)
+                return (original.group(1) + " " if original else "") + _filler(rng, 8)
+            return "Improved answer: " + _filler(rng, 40)
+        return _filler(rng, 30)
+
+    def _verdict(self, rng):
+        if rng.random() < self.correct_rate:
+            return "CORRECT"
+        return f"INCOMPLETE: The answer should say more about the {rng.choice(_WORDS)}."
+
+
+def _filler(rng, words):
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _steps(current, remaining, rng, count):
+    numbers = [n.strip() for n in remaining.split(",") if n.strip()]
+    steps = []
+    for number in dict.fromkeys(numbers):
+        steps += [f"({current})+{number}", f"({current})-{number}", f"{number}-({current})",
+                  f"({current})*{number}", f"({current})/{number}"]
+    rng.shuffle(steps)
+    return steps[:count]
+
+
+def _tot_steps(user, rng):
+    remaining = re.search(r"Remaining numbers: \[([^\]]*)\]", user)
+    expression = re.search(r"Current expression: '([^']*)'", user)
+    branches = re.search(r"Generate (\d+) next steps", user)
+    if not remaining or not expression:
+        return "[]"
+    return json.dumps(_steps(expression.group(1), remaining.group(1), rng, int(branches.group(1)) if branches else 3))
+
+
+def _tot_batch_steps(user, rng):
+    branches = re.search(r"Generate (\d+) next steps", user)
+    count = int(branches.group(1)) if branches else 3
+    nodes = re.findall(r"Node (\w+): current expression '([^']*)', remaining numbers \[([^\]]*)\]", user)
+    return json.dumps({node_id: _steps(current, remaining, rng, count) for node_id, current, remaining in nodes})
+
+
+def _react_thought(system, user, rng, answer_rate):
+    question = re.search(r"Original question: (.*)", user)
+    question = (question.group(1) if question else user).strip().rstrip("?")
+    # With parallel searches offered, ask about the question and up to fan - 1 related aspects
+    fan = re.search(r'write up to\s+(\d+) "SEARCH', system)
+    aspects = rng.sample(_WORDS, int(fan.group(1)) - 1) if fan else []
+    if "Observation:" in user or "Summary of earlier steps" in user:
+        if rng.random() < answer_rate:
+            return "ANSWER: " + _filler(rng, 25)
+        if not aspects:
+            return "SEARCH: " + question + " " + rng.choice(_WORDS)
+        return "\n".join(f"SEARCH: {question} {aspect}" for aspect in aspects + [rng.choice(_WORDS)])
+    return "\n".join(["SEARCH: " + question] + [f"SEARCH: {question} {aspect}" for aspect in aspects])
+
+
+def _usage(messages, content):
+    prompt = sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+    completion = len(content) // 4 + 1
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                return self._send_json(200, server.stats())
+            if url.path.startswith("/duckduckgo"):
+                server.count("duckduckgo")
+                server.delay(server.search_latency)
+                query = parse_qs(url.query).get("q", [""])[0]
+                rng = server.rng_for("duckduckgo", query)
+                if rng.random() >= server.search_hit_rate:
+                    return self._send_json(200, {"Abstract": "", "RelatedTopics": []})
+                return self._send_json(200, {
+                    "Abstract": f"{query}: " + _filler(rng, 30),
+                    "RelatedTopics": [{"Text": _filler(rng, 20)} for _ in range(2)],
+                })
+            if url.path.startswith("/wikipedia/"):
+                server.count("wikipedia")
+                server.delay(server.search_latency)
+                title = unquote(url.path[len("/wikipedia/"):])
+                rng = server.rng_for("wikipedia", title)
+                if rng.random() >= server.search_hit_rate:
+                    return self._send_json(404, {"title": "Not found."})
+                return self._send_json(200, {"title": title, "extract": _filler(rng, 60)})
+            self._send_json(404, {"error": {"message": f"Unknown path {url.path}"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if urlparse(self.path).path != "/v1/chat/completions":
+                return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            server.count("chat")
+            server.delay(server.latency)
+            roll = server.draw()
+            if roll < server.rate_limit_rate:
+                server.count("chat_429")
+                return self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests"}},
+                                       {"Retry-After": "0.05"})
+            if roll < server.rate_limit_rate + server.error_rate:
+                server.count("chat_500")
+                return self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+
+            messages = request.get("messages", [])
+            n = request.get("n", 1)
+            contents = [server.reply(messages, n, index) for index in range(n)]
+            model = request.get("model", "mock")
+            created = int(time.time())
+            if request.get("stream"):
+                return self._stream(model, created, contents[0])
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": index, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"} for index, content in enumerate(contents)],
+                "usage": _usage(messages, "".join(contents)),
+            })
+
+        def _stream(self, model, created, content):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = re.findall(r"\S+\s*", content) or [""]
+            for piece in pieces:
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                      "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock OpenAI and search endpoints for offline runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds per chat completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of completions failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction failing with 429")
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--plateau-rate", type=float, default=0.0,
+                        help="fraction of Reflect corrections that only extend the original answer")
+    parser.add_argument("--script", help='JSON list of {"match", "response"} rules checked before generated replies')
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+    server = MockServer(args.host, args.port, args.seed, args.latency, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, search_latency=args.search_latency,
+                        plateau_rate=args.plateau_rate, script=script)
+    for name, value in server.env.items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from batch import read_items
+from bench.mock_server import MockServer
+from shared.agents import close_agent, create_agent, load_agent_module, run_agent
+from shared.llm_cache import LLMCache, MemoryBackend, set_llm_cache
+from shared.steps import discard_step, step_sink
+from shared.tracing import span
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Metrics compared against the baseline, and which tolerance applies to each
+COUNT_METRICS = ("llm_calls_per_item", "search_calls_per_item", "nodes_expanded_per_item", "tokens_per_item",
+                 "errors")
+LATENCY_METRICS = ("p50_s", "p95_s")
+# Metrics where lower is worse
+QUALITY_METRICS = ("solve_rate",)
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of a non-empty list"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _count_calls(module, name, counter):
+    original = getattr(module, name)
+
+    def counted(*args, **kwargs):
+        counter[0] += 1
+        return original(*args, **kwargs)
+
+    setattr(module, name, counted)
+    return original
+
+
+def bench_agent(agent_name, items, server, agent_kwargs=None, run_kwargs=None):
+    """Run items one at a time so every LLM and search call is attributed to its item"""
+    module = load_agent_module(agent_name)
+    search_calls = [0]
+    original_search = None
+    if agent_name == "react":
+        import search_cache
+        # A fresh memory-only search cache per agent keeps counts independent of earlier runs
+        search_cache.set_search_cache(search_cache.SearchCache())
+        original_search = _count_calls(module, "search_web", search_calls)
+
+    agent = create_agent(agent_name, **(agent_kwargs or {}))
+    samples = []
+    try:
+        for item in items:
+            chat_before = server.stats().get("chat", 0)
+            search_before = search_calls[0]
+            error = None
+            result = {}
+            started = time.perf_counter()
+            try:
+                with step_sink(discard_step), span("bench.item", agent=agent_name, id=item["id"]) as trace:
+                    result = run_agent(agent_name, agent, item, **(run_kwargs or {}))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            usage = trace.totals()
+            sample = {
+                "id": item["id"],
+                "elapsed": time.perf_counter() - started,
+                "llm_calls": server.stats().get("chat", 0) - chat_before,
+                "search_calls": search_calls[0] - search_before,
+                "tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+                "cost": usage["cost"],
+                "error": error,
+            }
+            if agent_name == "tot":
+                sample["nodes_expanded"] = agent.nodes_expanded
+                stats = agent.transpositions.stats()
+                sample["transposition_lookups"], sample["transposition_hits"] = stats["lookups"], stats["hits"]
+                # Datasets from `ToT/solver.py dataset` say which puzzles have a solution
+                if item.get("solvable"):
+                    sample["solved"] = bool(result.get("solutions"))
+            samples.append(sample)
+    finally:
+        close_agent(agent)
+        if original_search is not None:
+            module.search_web = original_search
+    return summarize(samples)
+
+
+def summarize(samples):
+    elapsed = [sample["elapsed"] for sample in samples]
+    report = {
+        "items": len(samples),
+        "errors": sum(1 for sample in samples if sample["error"]),
+        "p50_s": round(percentile(elapsed, 0.50), 4),
+        "p95_s": round(percentile(elapsed, 0.95), 4),
+        "llm_calls_per_item": round(sum(s["llm_calls"] for s in samples) / len(samples), 3),
+        "search_calls_per_item": round(sum(s["search_calls"] for s in samples) / len(samples), 3),
+        "tokens_per_item": round(sum(s["tokens"] for s in samples) / len(samples), 1),
+        "cost_per_item": round(sum(s["cost"] for s in samples) / len(samples), 6),
+    }
+    if "nodes_expanded" in samples[0]:
+        report["nodes_expanded_per_item"] = round(sum(s["nodes_expanded"] for s in samples) / len(samples), 3)
+        lookups = sum(s["transposition_lookups"] for s in samples)
+        hits = sum(s["transposition_hits"] for s in samples)
+        report["transposition_hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+    scored = [sample["solved"] for sample in samples if "solved" in sample]
+    if scored:
+        report["solve_rate"] = round(sum(scored) / len(scored), 3)
+    return report
+
+
+def compare(report, baseline, count_tolerance=0.0, latency_tolerance=0.25, latency_slack=0.01):
+    """
+    List regressions of report against baseline. Counts may grow by count_tolerance
+    (a fraction); latencies by latency_tolerance plus latency_slack seconds of noise.
+    """
+    regressions = []
+    for agent_name, current in report["agents"].items():
+        previous = baseline.get("agents", {}).get(agent_name)
+        if previous is None:
+            continue
+        for metric in COUNT_METRICS + LATENCY_METRICS + QUALITY_METRICS:
+            if metric not in current or metric not in previous:
+                continue
+            if metric in QUALITY_METRICS:
+                if current[metric] < previous[metric] * (1 - count_tolerance) - 1e-9:
+                    regressions.append(f"{agent_name}.{metric}: {current[metric]} < baseline {previous[metric]}")
+                continue
+            if metric in COUNT_METRICS:
+                limit = previous[metric] * (1 + count_tolerance)
+            else:
+                limit = previous[metric] * (1 + latency_tolerance) + latency_slack
+            if current[metric] > limit + 1e-9:
+                regressions.append(f"{agent_name}.{metric}: {current[metric]} > baseline {previous[metric]}")
+    return regressions
+
+
+def print_report(report, baseline=None, out=sys.stdout):
+    columns = ("items", "errors", "p50_s", "p95_s", "llm_calls_per_item", "search_calls_per_item",
+               "nodes_expanded_per_item", "tokens_per_item", "solve_rate")
+    # Cells hold "value (baseline)" when there is a baseline to show
+    widths = [max(len(column), 16 if baseline else 6) + 2 for column in columns]
+    print(f"{'agent':<8}" + "".join(f"{column:>{width}}" for column, width in zip(columns, widths)), file=out)
+    for agent_name, metrics in report["agents"].items():
+        previous = (baseline or {}).get("agents", {}).get(agent_name, {})
+        cells = []
+        for column, width in zip(columns, widths):
+            value = metrics.get(column, "-")
+            if column in previous and column in metrics:
+                value = f"{value} ({previous[column]})"
+            cells.append(f"{value:>{width}}")
+        print(f"{agent_name:<8}" + "".join(cells), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the agents offline against a local mock of OpenAI and the search APIs")
+    parser.add_argument("--agents", default="react,reflect,tot", help="comma-separated agents to run")
+    parser.add_argument("--datasets", default=os.path.join(BENCH_DIR, "datasets"),
+                        help="directory holding <agent>.jsonl inputs")
+    parser.add_argument("--limit", type=int, help="items per agent")
+    parser.add_argument("--agent-kwargs", type=json.loads, default={},
+                        help='constructor arguments per agent, e.g. \'{"reflect": {"num_candidates": 3}}\'')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds per chat completion")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="mean seconds per search request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of completions failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction failing with 429")
+    parser.add_argument("--plateau-rate", type=float, default=0.0,
+                        help="fraction of Reflect corrections that only extend the original answer")
+    parser.add_argument("--script", help='JSON list of {"match", "response"} rules for the mock server')
+    parser.add_argument("--output", help="write the report JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--count-tolerance", type=float, default=0.0,
+                        help="allowed fractional growth of call counts")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                        help="allowed fractional growth of p50/p95")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+    server = MockServer(seed=args.seed, latency=args.latency, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, search_latency=args.search_latency,
+                        plateau_rate=args.plateau_rate, script=script)
+    config = {key: getattr(args, key) for key in ("seed", "latency", "search_latency", "error_rate",
+                                                   "rate_limit_rate", "plateau_rate", "limit", "agent_kwargs")}
+    report = {"config": config, "agents": {}}
+
+    with server, tempfile.TemporaryDirectory() as scratch:
+        # Everything the agents reach goes to the mock server or a scratch directory
+        os.environ.update(server.env)
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        os.environ["SEARCH_CACHE_PATH"] = ""
+        os.environ["SEARCH_INDEX_PATH"] = os.path.join(scratch, "search_index")
+        import openai
+        openai.api_base = server.env["OPENAI_API_BASE"]
+        # Every call must reach the server to be counted
+        set_llm_cache(LLMCache(MemoryBackend(), mode="off"))
+
+        for agent_name in [name.strip() for name in args.agents.split(",") if name.strip()]:
+            items = read_items(os.path.join(args.datasets, f"{agent_name}.jsonl"))[:args.limit]
+            print(f"Benchmarking {agent_name} on {len(items)} items...", file=sys.stderr)
+            report["agents"][agent_name] = bench_agent(agent_name, items, server, args.agent_kwargs.get(agent_name))
+        report["server"] = server.stats()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if baseline is not None:
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(report, baseline, args.count_tolerance, args.latency_tolerance)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from shared.agents import AGENT_DIRS, close_agent, create_agent, run_agent
+from shared.steps import discard_step, step_sink
+from shared.tracing import get_tracer
+
+
+class AgentPool:
+    """
+    Runs one agent type on its own worker threads, one agent instance per thread.
+    At most concurrency runs execute at once and at most max_queue more wait;
+    beyond that submit() callers are turned away.
+    """
+
+    def __init__(self, name, concurrency=4, max_queue=16, agent_kwargs=None):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.agent_kwargs = agent_kwargs or {}
+        self.pending = 0
+        self.running = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        # Moving average of run time, for Retry-After hints
+        self.average_seconds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._agents = []
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"{name}-agent")
+
+    @property
+    def queued(self):
+        return self.pending - self.running
+
+    def full(self):
+        return self.pending >= self.concurrency + self.max_queue
+    
+    def reserve(self):
+        """Take a slot; call right after full() with no await in between, then submit() or release()"""
+        self.pending += 1
+    
+    def release(self):
+        self.pending -= 1
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up"""
+        average = self.average_seconds or 1.0
+        return max(1, math.ceil(average * (self.queued + 1) / self.concurrency))
+
+    def _call(self, item, run_kwargs, on_step):
+        with self._lock:
+            self.running += 1
+        started = time.perf_counter()
+        try:
+            if not hasattr(self._local, "agent"):
+                self._local.agent = create_agent(self.name, **self.agent_kwargs)
+                with self._lock:
+                    self._agents.append(self._local.agent)
+            # Set on this worker thread; the agent's own pools inherit it with the context
+            with step_sink(on_step or discard_step):
+                return run_agent(self.name, self._local.agent, item, **run_kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                if self.average_seconds is None:
+                    self.average_seconds = elapsed
+                else:
+                    self.average_seconds = 0.8 * self.average_seconds + 0.2 * elapsed
+
+    async def submit(self, item, run_kwargs=None, on_step=None):
+        """
+        Run an item on a slot taken with reserve(); the slot is released when the run ends.
+        on_step receives the agent's step events, from worker threads.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, self._call, item, run_kwargs or {}, on_step)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            agents, self._agents = self._agents, []
+        for agent in agents:
+            close_agent(agent)
+
+
+def parse_item(agent_name, body):
+    """Validate a request body into an item and run kwargs; raises ValueError"""
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    run_kwargs = {}
+    if agent_name == "tot":
+        numbers = body.get("numbers")
+        if (not isinstance(numbers, list) or not numbers
+                or not all(isinstance(n, int) and not isinstance(n, bool) for n in numbers)):
+            raise ValueError('"numbers" must be a non-empty list of integers')
+        return {"numbers": numbers}, run_kwargs
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError('"question" must be a non-empty string')
+    if agent_name == "react" and "max_iterations" in body:
+        if not isinstance(body["max_iterations"], int) or not 1 <= body["max_iterations"] <= 10:
+            raise ValueError('"max_iterations" must be an integer from 1 to 10')
+        run_kwargs["max_iterations"] = body["max_iterations"]
+    return {"question": question}, run_kwargs
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def handle_run(request):
+    pools = request.app["pools"]
+    agent_name = request.match_info["agent"]
+    if agent_name not in pools:
+        raise web.HTTPNotFound(text=json.dumps({"error": f"Unknown agent: {agent_name}"}),
+                               content_type="application/json")
+    try:
+        item, run_kwargs = parse_item(agent_name, await request.json())
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=json.dumps({"error": str(e)}), content_type="application/json")
+
+    pool = pools[agent_name]
+    if pool.full():
+        pool.rejected += 1
+        raise web.HTTPTooManyRequests(
+            text=json.dumps({"error": f"{agent_name} is at capacity, retry later"}),
+            content_type="application/json",
+            headers={"Retry-After": str(pool.retry_after())},
+        )
+    # Taken before any await so concurrent requests can't all pass the full() check
+    pool.reserve()
+
+    stream = (request.query.get("stream") not in (None, "", "0", "false")
+              or "text/event-stream" in request.headers.get("Accept", ""))
+    if not stream:
+        try:
+            result = await pool.submit(item, run_kwargs)
+        except Exception as e:
+            return web.json_response({"agent": agent_name, "error": f"{type(e).__name__}: {e}"}, status=502)
+        return web.json_response({"agent": agent_name, **result})
+    return await _stream_run(request, pool, item, run_kwargs)
+
+
+async def _stream_run(request, pool, item, run_kwargs):
+    """
+    Send each step event as an SSE "step" event (its data has the step's "type": thought,
+    observation, reflection, expansion, ...), ReAct answer tokens as "token", then "result"
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    if pool.name == "react":
+        run_kwargs = dict(run_kwargs, stream=True, on_token=lambda token: emit("token", {"text": token}))
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    try:
+        await response.prepare(request)
+        await response.write(_sse("queued", {"agent": pool.name, "queued": pool.queued}))
+    except BaseException:
+        # The run never started, so submit() won't release the slot
+        pool.release()
+        raise
+
+    # If the client goes away the run still finishes on its thread; its events are dropped
+    task = asyncio.ensure_future(pool.submit(item, run_kwargs, on_step=lambda event: emit("step", event)))
+    while True:
+        getter = asyncio.ensure_future(events.get())
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            event, data = getter.result()
+            await response.write(_sse(event, data))
+            continue
+        getter.cancel()
+        # The run is over; drain steps still in flight before the result
+        while not events.empty():
+            event, data = events.get_nowait()
+            await response.write(_sse(event, data))
+        break
+    try:
+        result = task.result()
+    except Exception as e:
+        await response.write(_sse("error", {"agent": pool.name, "error": f"{type(e).__name__}: {e}"}))
+    else:
+        await response.write(_sse("result", {"agent": pool.name, **result}))
+    await response.write_eof()
+    return response
+
+
+async def handle_agents(request):
+    return web.json_response({name: pool.stats() for name, pool in request.app["pools"].items()})
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request):
+    lines = [get_tracer().metrics.prometheus_text().rstrip("\n")]
+    gauges = [
+        ("agent_server_running", "gauge", "Runs executing", "running"),
+        ("agent_server_queued", "gauge", "Runs waiting for a worker", "queued"),
+        ("agent_server_completed_total", "counter", "Runs finished", "completed"),
+        ("agent_server_failed_total", "counter", "Runs that raised", "failed"),
+        ("agent_server_rejected_total", "counter", "Requests refused with 429", "rejected"),
+    ]
+    pools = request.app["pools"]
+    for metric, kind, description, key in gauges:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}"]
+        for name, pool in sorted(pools.items()):
+            lines.append(f'{metric}{{agent="{name}"}} {pool.stats()[key]}')
+    return web.Response(text="\n".join(lines) + "\n", content_type="text/plain")
+
+
+def create_app(concurrency=None, max_queue=16, agent_kwargs=None):
+    """
+    Build the aiohttp application. concurrency maps agent name -> worker threads
+    (default 4 each); agent_kwargs maps agent name -> constructor arguments.
+    """
+    concurrency = concurrency or {}
+    agent_kwargs = agent_kwargs or {}
+    pools = {name: AgentPool(name, concurrency.get(name, 4), max_queue, agent_kwargs.get(name))
+             for name in AGENT_DIRS}
+
+    app = web.Application()
+    app["pools"] = pools
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/v1/agents", handle_agents)
+    app.router.add_post("/v1/agents/{agent}/runs", handle_run)
+
+    async def shutdown(app):
+        for pool in pools.values():
+            pool.shutdown()
+    app.on_shutdown.append(shutdown)
+    return app
+
+
+def _parse_concurrency(text):
+    limits = {}
+    for part in filter(None, (text or "").split(",")):
+        name, _, value = part.partition("=")
+        if name not in AGENT_DIRS:
+            raise argparse.ArgumentTypeError(f"unknown agent {name!r}")
+        limits[name] = int(value)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the agents over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=_parse_concurrency, default={},
+                        help="concurrent runs per agent, e.g. react=8,tot=2,reflect=4 (default 4 each)")
+    parser.add_argument("--max-queue", type=int, default=16, help="runs allowed to wait per agent before 429")
+    args = parser.parse_args()
+    web.run_app(create_app(args.concurrency, args.max_queue), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
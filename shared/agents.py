@@ -0,0 +1,64 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Agent name -> directory holding its main.py
+AGENT_DIRS = {
+    "react": "ReAct",
+    "tot": "ToT",
+    "reflect": "Reflect",
+}
+
+_modules = {}
+
+
+def load_agent_module(name):
+    """Import an agent's main.py; every agent has one, so each gets its own module name"""
+    if name not in AGENT_DIRS:
+        raise ValueError(f"Unknown agent: {name} (choose from {', '.join(AGENT_DIRS)})")
+    if name not in _modules:
+        directory = os.path.join(ROOT, AGENT_DIRS[name])
+        # The agents import their sibling modules by bare name
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        spec = importlib.util.spec_from_file_location(f"{name}_agent", os.path.join(directory, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+def create_agent(name, **kwargs):
+    """Instantiate an agent by name; kwargs go to its constructor"""
+    module = load_agent_module(name)
+    cls = {"react": "ReActAgent", "tot": "ToTAgent", "reflect": "ReflectAgent"}[name]
+    return getattr(module, cls)(**kwargs)
+
+
+def close_agent(agent):
+    """Release an agent's thread pools, for agents that hold any"""
+    close = getattr(agent, "close", None)
+    if close is not None:
+        close()
+
+
+def run_agent(name, agent, item, **run_kwargs):
+    """
+    Run one item through an agent and return a JSON-serializable result.
+    ReAct and Reflect items need a "question"; ToT items need "numbers".
+    run_kwargs go to the agent's run method (e.g. max_iterations for ReAct).
+    """
+    if name == "tot":
+        solutions = agent.solve_24_game(list(item["numbers"]), **run_kwargs)
+        return {"solutions": [solution.expression for solution in solutions]}
+    if name == "reflect":
+        result = {"answer": agent.run(item["question"], **run_kwargs), "stop_reason": agent.stop_reason}
+    else:
+        result = {"answer": agent.run(item["question"], **run_kwargs)}
+    # Answers served from the answer cache carry the matched question and its similarity
+    if agent.cache_hit is not None:
+        result["cache_hit"] = agent.cache_hit
+    return result
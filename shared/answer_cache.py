@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from shared.similarity import LSHIndex, MinHasher, content_shingles, jaccard, lsh_params, normalize_text, same_subject
+
+# Bumped whenever stored signatures stop matching the shingling; older tables are dropped
+_SCHEMA_VERSION = 2
+
+
+class AnswerCache:
+    """
+    Final answers keyed by question, matched on paraphrases: questions are
+    MinHashed over their content words and content-word pairs (stopwords such as
+    "what", "is", "the" dropped) and an LSH index finds candidates, which are then
+    scored by exact shingle Jaccard similarity. Candidates whose content words
+    differ (2014 vs 2018, Hamlet vs Macbeth) never match, however similar the rest
+    of the text is.
+
+    Entries live in memory (least recently used evicted beyond max_entries) and,
+    with a path, in SQLite together with their signatures, so the index is rebuilt
+    on start without rehashing. Each namespace (agent) has its own entries.
+    """
+
+    def __init__(self, path=None, threshold=0.6, ttl=24 * 3600, max_entries=1024, num_perm=128):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(*lsh_params(threshold, num_perm))
+
+        # key -> entry dict, least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS answer_cache")
+                self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+                "signature TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM answer_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, namespace, question, answer, signature, expires_at FROM answer_cache "
+            "ORDER BY last_used DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, namespace, question, answer, signature, expires_at in reversed(rows):
+            signature = tuple(json.loads(signature))
+            if len(signature) != self.hasher.num_perm:
+                signature = self._signature(namespace, question)
+            self._insert(key, namespace, question, answer, signature, expires_at)
+
+    @staticmethod
+    def _key(namespace, question):
+        return hashlib.sha256(f"{namespace}\n{normalize_text(question)}".encode("utf-8")).hexdigest()
+
+    def _signature(self, namespace, question):
+        # The namespace is hashed in so different agents never land in the same buckets
+        return self.hasher.signature({namespace + "\0" + shingle for shingle in content_shingles(question)})
+
+    def _insert(self, key, namespace, question, answer, signature, expires_at):
+        if key in self._entries:
+            self.index.remove(key, self._entries.pop(key)["signature"])
+        self._entries[key] = {
+            "namespace": namespace, "question": question, "answer": answer,
+            "signature": signature, "shingles": content_shingles(question), "expires_at": expires_at,
+        }
+        self.index.add(key, signature)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.index.remove(key, entry["signature"])
+        if self._db is not None:
+            self._db.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+
+    def get(self, namespace, question):
+        """
+        Return {"answer", "question", "score"} for the most similar stored question
+        scoring at least threshold, or None.
+        """
+        signature = self._signature(namespace, question)
+        shingle_set = content_shingles(question)
+        now = time.time()
+
+        with self._lock:
+            best_key, best_score = None, 0.0
+            for key in self.index.candidates(signature):
+                entry = self._entries[key]
+                if entry["namespace"] != namespace:
+                    continue
+                if entry["expires_at"] <= now:
+                    self._drop(key)
+                    self.stats["expired"] += 1
+                    continue
+                score = jaccard(shingle_set, entry["shingles"])
+                if score >= self.threshold and score > best_score and same_subject(question, entry["question"]):
+                    best_key, best_score = key, score
+            if self._db is not None:
+                self._db.commit()
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._entries.move_to_end(best_key)
+            if self._db is not None:
+                self._db.execute("UPDATE answer_cache SET last_used = ? WHERE key = ?", (now, best_key))
+                self._db.commit()
+            entry = self._entries[best_key]
+            return {"answer": entry["answer"], "question": entry["question"], "score": round(best_score, 4)}
+
+    def put(self, namespace, question, answer):
+        """Store the final answer to a question, replacing one stored for the same normalized text"""
+        key = self._key(namespace, question)
+        signature = self._signature(namespace, question)
+        now = time.time()
+        expires_at = now + self.ttl
+
+        with self._lock:
+            self._insert(key, namespace, question, answer, signature, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answer_cache "
+                    "(key, namespace, question, answer, signature, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, namespace, question, answer, json.dumps(signature), expires_at, now),
+                )
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+            if self._db is not None:
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.index.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answer_cache")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """
+    Return the process-wide answer cache, configured from the environment on first use:
+    ANSWER_CACHE_PATH (SQLite file, default .answer_cache.sqlite next to the agent
+    directories wherever the process runs; empty for memory only), ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL (seconds) and ANSWER_CACHE_MAX_ENTRIES.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            _default_cache = AnswerCache(
+                os.getenv("ANSWER_CACHE_PATH", os.path.join(root, ".answer_cache.sqlite")) or None,
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.6")),
+                ttl=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+            )
+        return _default_cache
+
+
+def set_answer_cache(cache):
+    """Replace the process-wide answer cache (None recreates the default on next use)"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
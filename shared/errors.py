@@ -0,0 +1,45 @@
+class LLMError(Exception):
+    """Base class for failed LLM calls; never returned to agents as model output"""
+
+    retryable = False
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RateLimitError(LLMError):
+    """HTTP 429 from the API"""
+
+    retryable = True
+
+
+class ServerError(LLMError):
+    """HTTP 5xx or service unavailable"""
+
+    retryable = True
+
+
+class LLMTimeoutError(LLMError):
+    """The request timed out"""
+
+    retryable = True
+
+
+class LLMConnectionError(LLMError):
+    """The API could not be reached"""
+
+    retryable = True
+
+
+class AuthenticationError(LLMError):
+    """Missing, invalid or unauthorized API key"""
+
+
+class InvalidRequestError(LLMError):
+    """The API rejected the request itself (bad parameters, context too long, ...)"""
+
+
+class LLMCacheMiss(LLMError):
+    """Raised in replay mode when a request has no recorded response"""
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shared.errors import LLMCacheMiss
+
+CACHE_MODES = ("off", "normal", "record", "replay")
+
+
+def cache_key(model, messages, temperature=None, max_tokens=None, **params):
+    """Content address of a chat completion request; extra params such as n are part of it when given"""
+    request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    request.update(params)
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process store, evicting least recently used entries beyond max_bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is None:
+            return None
+        self._entries.move_to_end(key)
+        return json.loads(data)
+
+    def put(self, key, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+class DiskBackend:
+    """One JSON file per request under directory/ab/<hash>.json, evicting the stalest beyond max_bytes"""
+
+    def __init__(self, directory=".llm_cache", max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        # key -> (last use, size); rebuilt from the files so the limit holds across runs
+        self._index = {}
+        os.makedirs(directory, exist_ok=True)
+        for shard in os.scandir(directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    self._index[entry.name[:-5]] = (stat.st_mtime, stat.st_size)
+                    self.size += stat.st_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        if key not in self._index:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+        self._index[key] = (time.time(), self._index[key][1])
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+        if key in self._index:
+            self.size -= self._index[key][1]
+        self._index[key] = (time.time(), len(data))
+        self.size += len(data)
+
+        if self.size > self.max_bytes:
+            for stale in sorted(self._index, key=lambda k: self._index[k][0]):
+                if self.size <= self.max_bytes or stale == key:
+                    break
+                self._forget(stale)
+                self.evictions += 1
+
+    def _forget(self, key):
+        _, size = self._index.pop(key)
+        self.size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for key in list(self._index):
+            self._forget(key)
+
+
+class LLMCache:
+    """
+    Response cache shared by every agent's chat completion calls.
+
+    Modes: "normal" serves hits and stores misses, "record" always calls the API
+    and overwrites, "replay" never calls the API (misses raise LLMCacheMiss),
+    "off" bypasses the cache. Every call is cached by default, sampled ones too, so
+    a repeated run costs no API calls but repeats its samples. With max_temperature,
+    normal mode sends calls sampled above it to the API, so reruns draw fresh ToT
+    proposals and Reflect candidates; record and replay always cache every call so
+    replays stay reproducible.
+    """
+
+    def __init__(self, backend=None, mode="normal", max_temperature=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode} (choose from {', '.join(CACHE_MODES)})")
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.mode = mode
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _cacheable(self, temperature):
+        if self.mode == "off":
+            return False
+        if self.mode != "normal":
+            return True
+        return self.max_temperature is None or (temperature or 0) <= self.max_temperature
+
+    def _prepare(self, model, messages, temperature, max_tokens, kwargs):
+        params = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        params.update(kwargs)
+        key = cache_key(model, messages, temperature, max_tokens, **kwargs) if self._cacheable(temperature) else None
+        return params, key
+
+    def _lookup(self, key):
+        if key is None or self.mode == "record":
+            return None
+        with self._lock:
+            cached = self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached["content"]
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded response for request {key[:12]}")
+        return None
+
+    def _store(self, key, model, response):
+        # Requests sampling several choices (n > 1) get the list of their texts
+        if len(response.choices) > 1:
+            content = [choice.message.content for choice in response.choices]
+        else:
+            content = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        self._store_content(key, model, content, dict(usage) if usage else None)
+        return content
+
+    def _store_content(self, key, model, content, usage=None):
+        if key is None:
+            return
+        self.misses += 1
+        with self._lock:
+            self.backend.put(key, {
+                "model": model,
+                "content": content,
+                "usage": usage,
+                "created": time.time(),
+            })
+
+    def get_or_create(self, create, model, messages, temperature=None, max_tokens=None, **kwargs):
+        """Return the response text for a request, calling create(...) only on a miss"""
+        params, key = self._prepare(model, messages, temperature, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._store(key, model, create(**params))
+
+    async def aget_or_create(self, acreate, model, messages, temperature=None, max_tokens=None, **kwargs):
+        """Async get_or_create: awaits acreate(...) only on a miss"""
+        params, key = self._prepare(model, messages, temperature, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._store(key, model, await acreate(**params))
+
+    def stream_or_create(self, create_stream, model, messages, temperature=None, max_tokens=None, **kwargs):
+        """
+        Streaming get_or_create: yields text chunks from create_stream(...) on a miss
+        and stores the full text once the stream is consumed; a hit is one chunk.
+        """
+        params, key = self._prepare(model, messages, temperature, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for text in create_stream(**params):
+            parts.append(text)
+            yield text
+        self._store_content(key, model, "".join(parts))
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_bytes": self.backend.size,
+            "evictions": self.backend.evictions,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Return the process-wide LLM cache, configured from the environment on first use:
+    LLM_CACHE_MODE (off/normal/record/replay), LLM_CACHE_BACKEND (disk/memory),
+    LLM_CACHE_DIR (default .llm_cache next to the agent directories, wherever the
+    process runs), LLM_CACHE_MAX_BYTES and LLM_CACHE_MAX_TEMPERATURE (empty, the
+    default, caches calls at any temperature).
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+            if os.getenv("LLM_CACHE_BACKEND", "disk") == "memory":
+                backend = MemoryBackend(max_bytes)
+            else:
+                root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                backend = DiskBackend(os.getenv("LLM_CACHE_DIR", os.path.join(root, ".llm_cache")), max_bytes)
+            max_temperature = os.getenv("LLM_CACHE_MAX_TEMPERATURE", "")
+            _default_cache = LLMCache(
+                backend,
+                mode=os.getenv("LLM_CACHE_MODE", "normal"),
+                max_temperature=float(max_temperature) if max_temperature else None,
+            )
+        return _default_cache
+
+
+def set_llm_cache(cache):
+    """Replace the process-wide LLM cache (None recreates the default on next use)"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -0,0 +1,333 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import openai
+
+from shared.errors import (
+    AuthenticationError,
+    InvalidRequestError,
+    LLMConnectionError,
+    LLMError,
+    LLMTimeoutError,
+    RateLimitError,
+    ServerError,
+)
+from shared.llm_cache import get_llm_cache
+from shared.tracing import record_llm_call
+
+
+def estimate_prompt_tokens(messages):
+    """~4 characters per token plus per-message overhead"""
+    return sum(len(message.get("content") or "") for message in messages) // 4 + 4 * len(messages)
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough request size for rate limiting: the prompt estimate plus the completion budget"""
+    return estimate_prompt_tokens(messages) + (max_tokens or 256)
+
+
+def _record_response(model, response):
+    usage = getattr(response, "usage", None)
+    if usage:
+        record_llm_call(model, usage["prompt_tokens"], usage["completion_tokens"])
+        return usage["total_tokens"]
+    record_llm_call(model)
+    return None
+
+
+def _delta_text(chunk):
+    delta = chunk.choices[0].delta
+    return delta.get("content") if hasattr(delta, "get") else getattr(delta, "content", None)
+
+
+def translate_error(exc):
+    """Map an openai exception onto the typed LLMError hierarchy"""
+    if isinstance(exc, LLMError):
+        return exc
+
+    status = getattr(exc, "http_status", None)
+    headers = getattr(exc, "headers", None) or {}
+    retry_after = None
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+    message = str(exc) or type(exc).__name__
+
+    if isinstance(exc, openai.error.RateLimitError) or status == 429:
+        return RateLimitError(message, status, retry_after)
+    if isinstance(exc, openai.error.Timeout):
+        return LLMTimeoutError(message, status)
+    if isinstance(exc, openai.error.APIConnectionError):
+        return LLMConnectionError(message, status)
+    if isinstance(exc, (openai.error.AuthenticationError, openai.error.PermissionError)) or status in (401, 403):
+        return AuthenticationError(message, status)
+    if isinstance(exc, openai.error.ServiceUnavailableError) or (status is not None and status >= 500):
+        return ServerError(message, status, retry_after)
+    if isinstance(exc, openai.error.InvalidRequestError) or (status is not None and 400 <= status < 500):
+        return InvalidRequestError(message, status)
+    if isinstance(exc, openai.error.APIError):
+        return ServerError(message, status, retry_after)
+    return LLMError(message, status)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; reserve() takes capacity and reports how long to wait"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount tokens, going into debt if needed; returns seconds until the debt is repaid"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Global concurrency cap plus requests- and tokens-per-minute buckets"""
+
+    def __init__(self, max_concurrency=8, requests_per_minute=None, tokens_per_minute=None):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def _try_enter(self):
+        with self._condition:
+            if self.in_flight >= self.max_concurrency:
+                return False
+            self.in_flight += 1
+            return True
+
+    def _reserve(self, estimated_tokens):
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    def acquire(self, estimated_tokens):
+        """Block until a slot is free and the buckets allow the request"""
+        with self._condition:
+            while self.in_flight >= self.max_concurrency:
+                self._condition.wait()
+            self.in_flight += 1
+        wait = self._reserve(estimated_tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens):
+        """acquire() for coroutines: polls for a slot instead of blocking the event loop"""
+        delay = 0.005
+        while not self._try_enter():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        wait = self._reserve(estimated_tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def release(self, estimated_tokens=None, used_tokens=None):
+        """Free the slot and correct the token bucket with the actual usage"""
+        if self.tokens is not None and estimated_tokens is not None and used_tokens is not None:
+            self.tokens.refund(estimated_tokens - used_tokens)
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def get_rate_limiter():
+    """
+    Return the process-wide limiter shared by every client, configured from
+    LLM_MAX_CONCURRENCY (default 8), LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                max_concurrency=_env_int("LLM_MAX_CONCURRENCY", 8),
+                requests_per_minute=_env_int("LLM_REQUESTS_PER_MINUTE"),
+                tokens_per_minute=_env_int("LLM_TOKENS_PER_MINUTE"),
+            )
+        return _limiter
+
+
+def set_rate_limiter(limiter):
+    """Replace the process-wide limiter (None recreates the default on next use)"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+
+
+class OpenAIClient:
+    """
+    Chat completion client used by every agent.
+    Calls go through the shared response cache, then the global rate limiter,
+    and are retried with jittered exponential backoff on 429, 5xx, timeouts and
+    connection errors. Failures raise LLMError subclasses. The API key belongs to
+    the client and is passed with each request, so clients with different keys
+    can share a process.
+    """
+
+    def __init__(self, api_key=None, model="gpt-3.5-turbo", max_retries=5,
+                 backoff_base=1.0, backoff_max=30.0, request_timeout=60):
+        # Without a key here or in the environment, openai falls back to openai.api_key
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+
+    def _backoff(self, attempt, error):
+        if error.retry_after:
+            return min(error.retry_after, self.backoff_max)
+        # Full jitter keeps concurrent retries from synchronizing
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _create(self, **params):
+        limiter = get_rate_limiter()
+        estimated = estimate_tokens(params["messages"], params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire(estimated)
+            used = None
+            try:
+                response = openai.ChatCompletion.create(api_key=self.api_key, request_timeout=self.request_timeout,
+                                                        **params)
+                used = _record_response(params["model"], response)
+                return response
+            except Exception as e:
+                error = translate_error(e)
+                record_llm_call(params["model"], error=True)
+                if not error.retryable or attempt == self.max_retries:
+                    raise error from e
+            finally:
+                limiter.release(estimated, used)
+            time.sleep(self._backoff(attempt, error))
+
+    def _create_stream(self, **params):
+        limiter = get_rate_limiter()
+        estimated = estimate_tokens(params["messages"], params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire(estimated)
+            started = False
+            completion = 0
+            try:
+                stream = openai.ChatCompletion.create(api_key=self.api_key, request_timeout=self.request_timeout,
+                                                      stream=True, **params)
+                for chunk in stream:
+                    text = _delta_text(chunk)
+                    if text:
+                        started = True
+                        completion += len(text)
+                        yield text
+                # Streamed responses carry no usage, so both sides are estimated
+                record_llm_call(params["model"], estimate_prompt_tokens(params["messages"]), (completion + 3) // 4)
+                return
+            except Exception as e:
+                error = translate_error(e)
+                record_llm_call(params["model"], error=True)
+                # Once tokens reached the caller a retry would repeat them
+                if started or not error.retryable or attempt == self.max_retries:
+                    raise error from e
+            finally:
+                limiter.release()
+            time.sleep(self._backoff(attempt, error))
+
+    async def _acreate(self, **params):
+        limiter = get_rate_limiter()
+        estimated = estimate_tokens(params["messages"], params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire_async(estimated)
+            used = None
+            try:
+                response = await openai.ChatCompletion.acreate(api_key=self.api_key,
+                                                              request_timeout=self.request_timeout, **params)
+                used = _record_response(params["model"], response)
+                return response
+            except Exception as e:
+                error = translate_error(e)
+                record_llm_call(params["model"], error=True)
+                if not error.retryable or attempt == self.max_retries:
+                    raise error from e
+            finally:
+                limiter.release(estimated, used)
+            await asyncio.sleep(self._backoff(attempt, error))
+
+    def chat(self, messages, model=None, temperature=0.7, max_tokens=None):
+        """Return the assistant's reply text; raises LLMError on failure"""
+        return get_llm_cache().get_or_create(
+            self._create,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    def chat_choices(self, messages, n=1, model=None, temperature=0.7, max_tokens=None):
+        """Sample n replies in one request (the API's n parameter); returns a list of texts"""
+        params = {"n": n} if n > 1 else {}
+        content = get_llm_cache().get_or_create(
+            self._create,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **params
+        )
+        return content if isinstance(content, list) else [content]
+    
+    def chat_stream(self, messages, model=None, temperature=0.7, max_tokens=None):
+        """Yield the assistant's reply as text chunks as they arrive; raises LLMError on failure"""
+        return get_llm_cache().stream_or_create(
+            self._create_stream,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    async def achat(self, messages, model=None, temperature=0.7, max_tokens=None):
+        """Async chat(); many calls can be awaited concurrently under the same limits"""
+        return await get_llm_cache().aget_or_create(
+            self._acreate,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    def send_message(self, messages, model="gpt-3.5-turbo", stream=False):
+        """
+        Send messages to OpenAI API and get response.
+        Returns the assistant's response, or a generator of text chunks if stream is True.
+        Raises LLMError if the call fails.
+        """
+        if stream:
+            return self.chat_stream(messages, model=model, temperature=0.7)
+        return self.chat(messages, model=model, temperature=0.7)
@@ -0,0 +1,164 @@
+import hashlib
+import random
+import re
+
+_WORD = re.compile(r"\w+")
+
+
+def words(text):
+    """Lowercased word tokens"""
+    return _WORD.findall((text or "").lower())
+
+
+def shingles(text, k=3):
+    """Set of word k-grams; a text shorter than k words is one shingle"""
+    tokens = words(text)
+    if len(tokens) <= k:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets; two empty sets are identical"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def text_similarity(a, b, k=3):
+    """Shingled Jaccard similarity of two texts, from 0.0 (disjoint) to 1.0 (same word sequence)"""
+    return jaccard(shingles(a, k), shingles(b, k))
+
+
+def normalize_text(text):
+    """Lowercased words joined by single spaces, without punctuation"""
+    return " ".join(words(text))
+
+
+# Words that carry no subject of their own: articles, auxiliaries, pronouns, question
+# words and the generic nouns of "which team / which year" questions. Negations,
+# comparisons and ordinals ("not", "before", "first") are kept.
+STOPWORDS = frozenset("""
+a an the this that these those it its there here
+is are was were be been being am do does did done has have had will would shall should can could may might must
+of in on at to for by with from about as into onto
+and or but if then so
+what which who whom whose when where why how
+i me my we us our you your he him his she her they them their
+s t d ll re ve m
+please tell know name called
+team person people country city year thing
+""".split())
+
+
+def _stem(word):
+    """Strip one common inflection (plurals, -ed, -ing) from words long enough to keep a stem"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def content_words(text):
+    """Stemmed words of a text other than stopwords, in order"""
+    return [_stem(word) for word in words(text) if word not in STOPWORDS]
+
+
+def content_shingles(text):
+    """
+    Set of content words and adjacent content-word pairs: paraphrases that only
+    change function words ("What's" / "What is", "of OpenAI" / "OpenAI's") share
+    all words and most pairs, while reordered ones share the words alone.
+    """
+    tokens = content_words(text)
+    return set(tokens) | {tokens[i] + " " + tokens[i + 1] for i in range(len(tokens) - 1)}
+
+
+def same_subject(a, b):
+    """
+    Whether two texts use the same content words. Any word only one of them has
+    (hamlet / macbeth, 2014 / 2018, fahrenheit / celsius) makes them different
+    questions, however similar the rest of the text is. Texts made of stopwords
+    alone only match when their normalized texts are equal.
+    """
+    words_a, words_b = set(content_words(a)), set(content_words(b))
+    if not words_a and not words_b:
+        return normalize_text(a) == normalize_text(b)
+    return words_a == words_b
+
+
+# Mersenne prime modulus of the MinHash permutations (x -> (a * x + b) mod p)
+_MERSENNE = (1 << 61) - 1
+
+
+class MinHasher:
+    """
+    Fixed-length MinHash signatures of shingle sets. The fraction of positions at
+    which two signatures agree estimates the Jaccard similarity of the sets.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+                  for shingle in shingle_set] or [0]
+        return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in self._perms)
+
+
+def estimate_jaccard(a, b):
+    """Jaccard similarity estimated from two MinHash signatures of equal length"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def lsh_params(threshold, num_perm, recall=0.95):
+    """
+    (bands, rows) for banding num_perm-long signatures: the most rows per band (the
+    fewest false candidates) that still make a pair with Jaccard similarity at
+    threshold share a band with probability at least recall.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hash index over MinHash signatures: keys whose
+    signatures agree on all rows of any band are returned as candidates.
+    """
+
+    def __init__(self, bands, rows):
+        self.bands = bands
+        self.rows = rows
+        self._buckets = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key, signature):
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key, signature):
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def candidates(self, signature):
+        found = set()
+        for band_key in self._band_keys(signature):
+            found |= self._buckets.get(band_key, set())
+        return found
+
+    def clear(self):
+        self._buckets.clear()
@@ -0,0 +1,65 @@
+import contextlib
+import contextvars
+import sys
+import threading
+
+# Where agents report their steps; None prints them
+_current_sink = contextvars.ContextVar("step_sink", default=None)
+
+
+def _write_step(event, out):
+    if event["type"] == "token":
+        print(event["text"], end="", flush=True, file=out)
+    elif not event.get("streamed"):
+        print(event["text"], file=out)
+
+
+def print_step(event):
+    """
+    Default sink: print each step's text, streamed answer tokens without a newline.
+    An answer that was streamed has already been printed token by token.
+    """
+    _write_step(event, sys.stdout)
+
+
+def discard_step(event):
+    """Sink that drops every step"""
+
+
+class StepWriter:
+    """Sink writing each step's text to a file as print_step does; safe to share between threads"""
+
+    def __init__(self, out):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            _write_step(event, self.out)
+
+
+@contextlib.contextmanager
+def step_sink(sink):
+    """
+    Send the steps of agents run in this context to sink, a callable taking one
+    event dict; None keeps the current sink. The sink follows contextvars, so it
+    also receives steps reported from worker threads run under a copied context,
+    and it may be called from several threads at once.
+    """
+    if sink is None:
+        yield
+        return
+    token = _current_sink.set(sink)
+    try:
+        yield
+    finally:
+        _current_sink.reset(token)
+
+
+def emit_step(kind, text, **fields):
+    """
+    Report one agent step as {"type": kind, "text": text, **fields} to the current
+    sink. text is the line the agents print by default; fields carry the same step
+    as data (the thought, the search observation, a tree expansion's children, ...).
+    """
+    (_current_sink.get() or print_step)({"type": kind, "text": text, **fields})
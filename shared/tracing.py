@@ -0,0 +1,321 @@
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+# USD per 1K (prompt, completion) tokens, matched on the longest model-name prefix
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+
+# Upper bounds in seconds of the span latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+
+def _prices():
+    prices = dict(MODEL_PRICES)
+    override = os.getenv("LLM_PRICES")
+    if override:
+        prices.update({model: tuple(price) for model, price in json.loads(override).items()})
+    return prices
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of a call; 0.0 for models without a known price"""
+    prices = _prices()
+    matches = [name for name in prices if model == name or model.startswith(name + "-")]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = prices[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class Span:
+    """
+    One timed phase of an agent run. Usage fields count only LLM calls made
+    directly inside this span; totals() adds up the whole subtree.
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.span_id = next(_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self.llm_calls = 0
+        self.llm_errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_llm_call(self, prompt_tokens=0, completion_tokens=0, cost=0.0, error=False):
+        with self._lock:
+            if error:
+                self.llm_errors += 1
+                return
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def walk(self):
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def totals(self):
+        totals = {"llm_calls": 0, "llm_errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+        for span in self.walk():
+            for key in totals:
+                totals[key] += getattr(span, key)
+        return totals
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "llm_calls": self.llm_calls,
+            "llm_errors": self.llm_errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": round(self.cost, 8),
+            "totals": self.totals(),
+            "children": [child.to_dict() for child in list(self.children)],
+        }
+
+
+class PrintSink:
+    """Prints each finished trace as an indented tree"""
+
+    def __init__(self, out=None):
+        self.out = out
+
+    def export(self, root):
+        out = self.out or sys.stdout
+        for span, depth in _walk_depth(root):
+            totals = span.totals()
+            line = f"{'  ' * depth}{span.name} {span.duration:.3f}s"
+            if totals["llm_calls"]:
+                line += (f" llm={totals['llm_calls']} tokens={totals['prompt_tokens']}+"
+                         f"{totals['completion_tokens']} cost=${totals['cost']:.5f}")
+            if span.status != "ok":
+                line += f" [{span.error}]"
+            print(line, file=out)
+
+
+def _walk_depth(span, depth=0):
+    yield span, depth
+    for child in list(span.children):
+        yield from _walk_depth(child, depth + 1)
+
+
+class JSONLinesSink:
+    """Appends each finished trace to a file as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, root):
+        line = json.dumps(root.to_dict(), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class MetricsSink:
+    """
+    Aggregates every span of every trace by name into Prometheus counters and a
+    latency histogram. With a path, the text format is rewritten after each trace
+    (for the node exporter's textfile collector).
+    """
+
+    def __init__(self, path=None, buckets=LATENCY_BUCKETS):
+        self.path = path
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def export(self, root):
+        with self._lock:
+            for span in root.walk():
+                entry = self._spans.setdefault(span.name, {
+                    "count": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * len(self.buckets),
+                    "llm_calls": 0, "llm_errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+                })
+                entry["count"] += 1
+                entry["errors"] += span.status != "ok"
+                entry["seconds"] += span.duration or 0.0
+                for i, bound in enumerate(self.buckets):
+                    if (span.duration or 0.0) <= bound:
+                        entry["buckets"][i] += 1
+                for key in ("llm_calls", "llm_errors", "prompt_tokens", "completion_tokens", "cost"):
+                    entry[key] += getattr(span, key)
+        if self.path:
+            text = self.prometheus_text()
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(self.path + ".tmp", self.path)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in self._spans.items()}
+
+    def prometheus_text(self):
+        spans = self.snapshot()
+        lines = [
+            "# HELP agent_span_duration_seconds Latency of agent phases",
+            "# TYPE agent_span_duration_seconds histogram",
+        ]
+        for name, entry in sorted(spans.items()):
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                lines.append(f'agent_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'agent_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'agent_span_duration_seconds_sum{{span="{name}"}} {entry["seconds"]:.6f}')
+            lines.append(f'agent_span_duration_seconds_count{{span="{name}"}} {entry["count"]}')
+
+        counters = [
+            ("agent_span_errors_total", "Agent phases that raised", "errors"),
+            ("agent_llm_calls_total", "Completed LLM API calls", "llm_calls"),
+            ("agent_llm_errors_total", "Failed LLM API attempts, including retried ones", "llm_errors"),
+            ("agent_llm_cost_usd_total", "Estimated LLM cost in USD", "cost"),
+        ]
+        for metric, description, key in counters:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for name, entry in sorted(spans.items()):
+                lines.append(f'{metric}{{span="{name}"}} {entry[key]:g}')
+
+        lines += ["# HELP agent_llm_tokens_total LLM tokens used", "# TYPE agent_llm_tokens_total counter"]
+        for name, entry in sorted(spans.items()):
+            lines.append(f'agent_llm_tokens_total{{span="{name}",kind="prompt"}} {entry["prompt_tokens"]}')
+            lines.append(f'agent_llm_tokens_total{{span="{name}",kind="completion"}} {entry["completion_tokens"]}')
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """
+    Creates spans and hands each finished trace (a root span and its subtree) to the sinks.
+    The current span follows contextvars, so nesting works across coroutines; worker
+    threads must run under a copied context (contextvars.copy_context().run).
+    """
+
+    def __init__(self, sinks=None):
+        self.metrics = MetricsSink()
+        self.sinks = [self.metrics] + list(sinks or [])
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        if parent is not None:
+            with parent._lock:
+                parent.children.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(e)
+            raise
+        else:
+            span.finish()
+        finally:
+            _current_span.reset(token)
+            if parent is None:
+                self._export(span)
+
+    def _export(self, root):
+        for sink in list(self.sinks):
+            try:
+                sink.export(root)
+            except Exception as e:
+                # A broken sink must not fail the agent run it describes
+                print(f"Trace sink {type(sink).__name__} failed: {e}", file=sys.stderr)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def record_llm_call(model, prompt_tokens=0, completion_tokens=0, error=False):
+    """Attribute one LLM API call to the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        cost = 0.0 if error else estimate_cost(model, prompt_tokens, completion_tokens)
+        span.add_llm_call(prompt_tokens, completion_tokens, cost, error)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """
+    Return the process-wide tracer. Metrics are always aggregated; other sinks come
+    from TRACE_PRINT (1 prints each trace), TRACE_JSON_PATH (JSON lines file) and
+    TRACE_PROMETHEUS_PATH (Prometheus text file rewritten after each trace).
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            if os.getenv("TRACE_PRINT", "") not in ("", "0"):
+                _tracer.add_sink(PrintSink())
+            if os.getenv("TRACE_JSON_PATH"):
+                _tracer.add_sink(JSONLinesSink(os.getenv("TRACE_JSON_PATH")))
+            if os.getenv("TRACE_PROMETHEUS_PATH"):
+                _tracer.metrics.path = os.getenv("TRACE_PROMETHEUS_PATH")
+        return _tracer
+
+
+def set_tracer(tracer):
+    """Replace the process-wide tracer (None recreates the default on next use)"""
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def span(name, **attributes):
+    """Shorthand for get_tracer().span(...)"""
+    return get_tracer().span(name, **attributes)
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.answer_cache import AnswerCache
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Who won the FIFA World Cup in 2018?", "Who won the FIFA World Cup in 2014?"),
+    ("What was the population of the United States in 2020?",
+     "What was the population of the United States in 2010?"),
+    ("What is the population of NYC?", "What is the population of NY State?"),
+    ("When was Python first released?", "When was Java first released?"),
+    ("Who wrote Hamlet?", "who wrote macbeth"),
+    ("What is the boiling point of water in fahrenheit?", "What is the boiling point of water in celsius?"),
+    ("Did Python come before Java?", "Did Java come before Python?"),
+    ("Who are you?", "What is it?"),
+])
+def test_different_questions_miss(stored, asked):
+    cache = AnswerCache()
+    cache.put("react", stored, "stored answer")
+    assert cache.get("react", asked) is None
+
+
+def test_same_question_with_different_spelling_hits():
+    cache = AnswerCache()
+    cache.put("react", "Who won the FIFA World Cup in 2018?", "France")
+    hit = cache.get("react", "who won the fifa world cup in 2018")
+    assert hit["answer"] == "France"
+    assert hit["question"] == "Who won the FIFA World Cup in 2018?"
+    assert hit["score"] >= cache.threshold
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What is the capital of France?", "What's the capital of France?"),
+    ("Who is the current CEO of OpenAI?", "Who is OpenAI's current CEO?"),
+    ("Who won the FIFA World Cup in 2018?", "Which team won the 2018 FIFA World Cup?"),
+    ("How many moons does Mars have?", "Mars has how many moons?"),
+])
+def test_paraphrases_hit(stored, asked):
+    cache = AnswerCache()
+    cache.put("react", stored, "stored answer")
+    hit = cache.get("react", asked)
+    assert hit is not None and hit["answer"] == "stored answer"
+
+
+def test_namespaces_are_separate():
+    cache = AnswerCache()
+    cache.put("react", "When was Python first released?", "1991")
+    assert cache.get("reflect", "When was Python first released?") is None
+
+
+def test_entries_persist(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    cache = AnswerCache(path)
+    cache.put("reflect", "When was Python first released?", "1991")
+    cache.close()
+    assert AnswerCache(path).get("reflect", "when was Python first released")["answer"] == "1991"
@@ -0,0 +1,28 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import batch
+
+
+def test_retried_item_leaves_one_record(tmp_path, monkeypatch):
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"id": 1, "agent": "react", "answer": "first", "error": None}) + "\n"
+        + json.dumps({"id": 2, "agent": "react", "error": "LLMError: boom"}) + "\n"
+        + '{"id": 3, "agent": "re'
+    )
+    monkeypatch.setattr(batch, "create_agent", lambda name, **kwargs: object())
+    monkeypatch.setattr(batch, "run_agent", lambda name, agent, item, **kwargs: {"answer": f"answer {item['id']}"})
+
+    items = [{"id": 1, "question": "a"}, {"id": 2, "question": "b"}, {"id": 3, "question": "c"}]
+    counts = batch.run_batch("react", items, str(output), workers=2, log=io.StringIO())
+
+    assert counts == {"completed": 2, "failed": 0, "skipped": 1}
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(record["id"] for record in records) == [1, 2, 3]
+    by_id = {record["id"]: record for record in records}
+    assert by_id[1]["answer"] == "first"
+    assert by_id[2] == dict(by_id[2], answer="answer 2", error=None)
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import openai
+import pytest
+from openai.openai_object import OpenAIObject
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.errors import AuthenticationError, InvalidRequestError, LLMError, RateLimitError, ServerError
+from shared.llm_cache import LLMCache, set_llm_cache
+from shared.openai_client import OpenAIClient, TokenBucket, set_rate_limiter, translate_error
+
+
+def _response(content):
+    return OpenAIObject.construct_from({
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    })
+
+
+def _rate_limited():
+    return openai.error.RateLimitError("slow down", http_status=429, headers={"retry-after": "0"})
+
+
+def _server_error():
+    return openai.error.APIError("boom", http_status=500)
+
+
+@pytest.fixture
+def create(monkeypatch):
+    """Stub openai.ChatCompletion.create replaying a script of exceptions and replies"""
+    set_llm_cache(LLMCache(mode="off"))
+    set_rate_limiter(None)
+    calls = []
+
+    def install(*script):
+        script = list(script)
+
+        def fake_create(**params):
+            calls.append(params)
+            step = script.pop(0)
+            if isinstance(step, Exception):
+                raise step
+            return _response(step)
+
+        monkeypatch.setattr(openai.ChatCompletion, "create", fake_create)
+        return calls
+
+    yield install
+    set_llm_cache(None)
+    set_rate_limiter(None)
+
+
+def _client(**kwargs):
+    return OpenAIClient("test-key", backoff_base=0.0, **kwargs)
+
+
+def test_retries_rate_limits_and_server_errors(create):
+    calls = create(_rate_limited(), _server_error(), "hello")
+    assert _client().chat([{"role": "user", "content": "hi"}]) == "hello"
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries(create):
+    calls = create(_server_error(), _server_error(), _server_error())
+    with pytest.raises(ServerError) as raised:
+        _client(max_retries=2).chat([{"role": "user", "content": "hi"}])
+    assert raised.value.status == 500
+    assert len(calls) == 3
+
+
+def test_does_not_retry_invalid_requests(create):
+    calls = create(openai.error.InvalidRequestError("bad", None, http_status=400), "unused")
+    with pytest.raises(InvalidRequestError):
+        _client().chat([{"role": "user", "content": "hi"}])
+    assert len(calls) == 1
+
+
+def test_each_client_sends_its_own_key(create):
+    calls = create("a", "b")
+    OpenAIClient("key-a", backoff_base=0.0).chat([{"role": "user", "content": "hi"}])
+    OpenAIClient("key-b", backoff_base=0.0).chat([{"role": "user", "content": "hi"}])
+    assert [call["api_key"] for call in calls] == ["key-a", "key-b"]
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (openai.error.RateLimitError("slow", http_status=429), RateLimitError),
+    (openai.error.APIError("boom", http_status=503), ServerError),
+    (openai.error.ServiceUnavailableError("down"), ServerError),
+    (openai.error.AuthenticationError("no key", http_status=401), AuthenticationError),
+    (openai.error.InvalidRequestError("bad", None, http_status=400), InvalidRequestError),
+    (ValueError("unexpected"), LLMError),
+])
+def test_translate_error(exc, expected):
+    error = translate_error(exc)
+    assert type(error) is expected
+    assert error.retryable == (expected in (RateLimitError, ServerError))
+
+
+def test_translate_error_reads_retry_after():
+    error = translate_error(openai.error.RateLimitError("slow", http_status=429, headers={"retry-after": "7"}))
+    assert error.retry_after == 7.0
+
+
+def test_token_bucket_waits_once_capacity_is_spent():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(30) == pytest.approx(30.0, abs=0.1)
+    bucket.refund(30)
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.1)
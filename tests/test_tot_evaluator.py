@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ToT"))
+from evaluator import can_reach
+
+
+def test_can_reach_needs_every_number_used():
+    # 4*6 hits 24 but 13 has nothing to cancel it
+    assert not can_reach(4, [6, 13])
+    assert can_reach(4, [6, 1, 1])
+
+
+def test_can_reach_without_remaining_numbers():
+    assert can_reach(24, [])
+    assert not can_reach(23, [])
+
+
+def test_can_reach_with_fractions():
+    # 8 / (3 - 8/3) = 24
+    assert can_reach(8, [3, 3, 8])
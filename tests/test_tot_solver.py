@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ToT"))
+import solver
+from solver import PuzzleIndex, known_solution, solve, solve_batch, verify_solution
+
+
+def test_solves_a_puzzle_needing_fractions():
+    assert solve([3, 3, 8, 8]) == ["8/(3-(8/3))"]
+
+
+def test_unsolvable_puzzle_has_no_solutions():
+    assert solve([1, 1, 1, 1]) == []
+
+
+def test_solve_batch_matches_solve():
+    results = solve_batch([[3, 3, 8, 8], [1, 1, 1, 1], [4, 6, 1, 1]])
+    assert [solution for solution, _ in results] == ["8/(3-(8/3))", None, "((4*6)-1)+1"]
+    assert results[0][1] > 0 and results[1][1] == 0.0
+
+
+@pytest.mark.parametrize("expression, numbers", [
+    ("8/(3-(8/3))", [3, 3, 8, 9]),  # a number missing from the puzzle
+    ("8*3", [3, 3, 8, 8]),          # numbers left unused
+    ("8*3*1*1*1", [1, 1, 3, 8]),    # a number used twice
+    ("24", [3, 3, 8, 8]),
+    ("8/(3-8/3", [3, 3, 8, 8]),     # does not parse
+    ("(4*6)-1+2", [4, 6, 1, 2]),    # right numbers, wrong value
+])
+def test_verify_solution_rejects(expression, numbers):
+    assert not verify_solution(expression, numbers)
+
+
+def test_verify_solution_accepts_any_order_of_the_numbers():
+    assert verify_solution("8/(3-(8/3))", [8, 3, 8, 3])
+
+
+def test_index_covers_every_puzzle_and_round_trips(tmp_path):
+    index = PuzzleIndex.build()
+    assert len(index) == 1820
+    assert sum(1 for solution in index.solutions if solution) == 1362
+    assert index.lookup([8, 3, 8, 3])[0] == "8/(3-(8/3))"
+    assert index.lookup([1, 1, 1, 1]) == (None, 0.0)
+    assert index.lookup([1, 1, 1, 14]) is None
+
+    path = str(tmp_path / "index" / "puzzles.npz")
+    index.save(path)
+    loaded = PuzzleIndex.load(path)
+    assert len(loaded) == len(index) and loaded.target == 24
+    for numbers in ([3, 3, 8, 8], [1, 1, 1, 1], [4, 9, 10, 13], [13, 13, 13, 13]):
+        assert loaded.lookup(numbers) == index.lookup(numbers)
+
+
+def test_known_solution_uses_the_index_and_falls_back_to_solving(tmp_path, monkeypatch):
+    monkeypatch.setenv("PUZZLE_INDEX_PATH", str(tmp_path / "puzzles.npz"))
+    monkeypatch.setattr(solver, "_index", None)
+    assert known_solution([3, 3, 8, 8]) == (True, "8/(3-(8/3))")
+    assert known_solution([1, 1, 1, 1]) == (False, None)
+    assert os.path.exists(tmp_path / "puzzles.npz")
+    # Outside the index's 1-13 range
+    solvable, solution = known_solution([20, 2, 1, 1])
+    assert solvable and verify_solution(solution, [20, 2, 1, 1])